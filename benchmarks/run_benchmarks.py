@@ -0,0 +1,173 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import networkx as nx
+import numpy as np
+
+from simple_network_sim import loaders, network_of_populations, population_engine, profiling
+from . import synthetic_inputs
+
+#  Scaling benchmarks for the loaders and the population engines, on synthetic inputs.
+#
+#  python -m benchmarks.run_benchmarks --output results.json
+#  python -m benchmarks.run_benchmarks --output new.json --compare results.json
+#
+#  Every (node count, edges per node) case writes its inputs, then times each loader, the setup, and each phase of
+#  the dict-based basicSimulationInternalAgeStructure (with the work counts from its profiling hooks) and of the
+#  array engine. Timings are in seconds, the best of
+#  --repeat runs. With --compare, any timing more than --tolerance slower than the baseline is reported and the exit
+#  status is 1, so this can gate a release.
+
+NODE_COUNTS = [10, 100, 1000, 10000, 100000]
+EDGES_PER_NODE = [4, 64]
+
+COMPARTMENTS = ["S", "E", "A", "I", "H", "R", "D"]
+CONTACT_RATE = 0.2
+
+
+def _timed(timings, name, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+    return result
+
+
+# CurrentlyInUse
+# The commutes file is read in the two steps of loaders.genGraphFromContactFile, so reading the edge list
+# (load.edges) and building the networkx graph from it (load.graph) are timed separately.
+def timeLoaders(inputs, timings):
+    params = _timed(timings, "load.parameters", loaders.readParametersAgeStructured, inputs["parameters"])
+    population = _timed(timings, "load.population", loaders.readPopulationAgeStructured, inputs["population"])
+    edges = _timed(timings, "load.edges", loaders.readEdgeListArrays, inputs["commutes"])
+    graph = _timed(timings, "load.graph", loaders.edgeArraysToGraph, *edges)
+    return params, population, graph
+
+
+# CurrentlyInUse
+# network_of_populations.basicSimulationInternalAgeStructure, timed phase by phase through its profiling hooks.
+# The work counts of each phase go into counts.
+def timeDictEngine(graph, ageToTrans, ageInfectionMatrix, population, timeHorizon, rand, timings, counts):
+    ages = list(ageToTrans)
+    dictOfStates = _timed(timings, "dict.setup", network_of_populations.setupInternalPopulations, graph, COMPARTMENTS, ages, population)
+    profile = profiling.newProfile()
+    network_of_populations.basicSimulationInternalAgeStructure(rand, graph, 10, timeHorizon, 0.1, ageInfectionMatrix, ageToTrans, dictOfStates, profile=profile)
+    for phase, summary in profile["phases"].items():
+        timings["dict." + phase] = summary["seconds"]
+        counts["dict." + phase] = summary["counts"]
+    return dictOfStates
+
+
+# CurrentlyInUse
+# The array engine as it is run: population_engine.doTimestep with running counters (array.timestep, over all the
+# steps), and a whole population_engine.runSimulation from the same start (array.run)
+def timeArrayEngine(graph, ageToTrans, ageInfectionMatrix, nodeStates, timeHorizon, timings):
+    model = _timed(timings, "array.compile", population_engine.compileModel, graph, ageInfectionMatrix, ageToTrans, nodeStates)
+    initialStates = _timed(timings, "array.setup", population_engine.statesToArray, model, nodeStates)
+    counters = _timed(timings, "array.counters", population_engine.setUpCounters, model, initialStates)
+    states = initialStates.copy()
+    nextStates = np.empty_like(states)
+    for t in range(timeHorizon):
+        _timed(timings, "array.timestep", population_engine.doTimestep, model, states, nextStates, counters)
+        states, nextStates = nextStates, states
+    _timed(timings, "array.run", population_engine.runSimulation, model, initialStates, timeHorizon, False)
+
+
+# CurrentlyInUse
+def runCase(numNodes, edgesPerNode, timeHorizon, repeat, seed, engines):
+    best = {}
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = synthetic_inputs.writeInputs(directory, numNodes, edgesPerNode, random.Random(seed))
+        for _ in range(repeat):
+            timings = {}
+            counts = {}
+            params, population, graph = timeLoaders(inputs, timings)
+            ageToTrans = network_of_populations.setUpParametersAges(params)
+            ageInfectionMatrix = {a: {b: CONTACT_RATE for b in ageToTrans} for a in ageToTrans}
+            if "dict" in engines:
+                dictOfStates = timeDictEngine(graph, ageToTrans, ageInfectionMatrix, population, timeHorizon, random.Random(seed), timings, counts)
+                nodeStates = dictOfStates[0]
+            else:
+                nodeStates = network_of_populations.setupInternalPopulations(graph, COMPARTMENTS, list(ageToTrans), population)[0]
+            if "array" in engines:
+                timeArrayEngine(graph, ageToTrans, ageInfectionMatrix, nodeStates, timeHorizon, timings)
+            for name, seconds in timings.items():
+                best[name] = min(seconds, best.get(name, seconds))
+    return {"nodes": numNodes, "edgesPerNode": edgesPerNode, "edges": inputs["edges"], "timeHorizon": timeHorizon, "timings": best, "counts": counts}
+
+
+def _caseKey(result):
+    return (result["nodes"], result["edgesPerNode"], result["timeHorizon"])
+
+
+# CurrentlyInUse
+# Returns a list of (nodes, edgesPerNode, timing name, baseline seconds, new seconds) for every timing more than
+# tolerance (as a fraction) slower than in the baseline. Timings shorter than minSeconds in both are too noisy to
+# compare and are skipped.
+def compareResults(baseline, results, tolerance, minSeconds=1e-3):
+    baselineCases = {_caseKey(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        if _caseKey(result) not in baselineCases:
+            continue
+        before = baselineCases[_caseKey(result)]["timings"]
+        for name, seconds in result["timings"].items():
+            if name not in before or max(seconds, before[name]) < minSeconds:
+                continue
+            if seconds > before[name]*(1 + tolerance):
+                regressions.append((result["nodes"], result["edgesPerNode"], name, before[name], seconds))
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Scaling benchmarks for simple_network_sim")
+    parser.add_argument("--nodes", type=int, nargs="+", default=NODE_COUNTS)
+    parser.add_argument("--edges-per-node", type=int, nargs="+", default=EDGES_PER_NODE)
+    parser.add_argument("--time-horizon", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", nargs="+", choices=["dict", "array"], default=["dict", "array"])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="baseline results file to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction, default 0.2")
+    args = parser.parse_args(argv)
+
+    results = {"environment": environment(), "results": []}
+    for numNodes in args.nodes:
+        for edgesPerNode in args.edges_per_node:
+            result = runCase(numNodes, edgesPerNode, args.time_horizon, args.repeat, args.seed, args.engines)
+            results["results"].append(result)
+            print(f"nodes={numNodes} edgesPerNode={edgesPerNode} edges={result['edges']}")
+            for name, seconds in sorted(result["timings"].items()):
+                print(f"    {name}: {seconds:.6f}s")
+            # written as we go, so a long run that gets killed still leaves its results
+            with open(args.output, "w") as fp:
+                json.dump(results, fp, indent=4)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compareResults(baseline, results, args.tolerance)
+        for (numNodes, edgesPerNode, name, before, after) in regressions:
+            print(f"REGRESSION nodes={numNodes} edgesPerNode={edgesPerNode} {name}: {before:.6f}s -> {after:.6f}s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
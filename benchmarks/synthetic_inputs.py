@@ -0,0 +1,76 @@
+import os
+
+# Synthetic inputs in the formats read by simple_network_sim.loaders, so the engine and the loaders can be
+# benchmarked at sizes we don't have real data for. Node labels are S<number>, like the health board codes.
+
+# Same parameters for every age group, taken from sample_input_files/paramsAgeStructured
+PARAMETERS = {
+    "e_escape": 0.427,
+    "a_escape": 0.197,
+    "a_to_i": 0.1,
+    "i_escape": 0.33,
+    "i_to_d": 0.05,
+    "i_to_h": 0.15,
+    "h_escape": 0.1,
+    "h_to_d": 0.42,
+}
+AGES = ["y", "m", "o"]
+
+
+def nodeLabels(numNodes):
+    return [f"S{n:08d}" for n in range(numNodes)]
+
+
+# CurrentlyInUse
+def writeParametersFile(filename):
+    with open(filename, "w") as fp:
+        for age in AGES:
+            for name, value in PARAMETERS.items():
+                fp.write(f"{age},{name}:{value}\n")
+
+
+# CurrentlyInUse
+# Two rows (Female, Male) per node, in the layout readPopulationAgeStructured expects
+def writePopulationFile(filename, nodes, rand):
+    with open(filename, "w") as fp:
+        fp.write("Health_Board,Sex,Total_across_age,Young,Medium,Old\n")
+        for node in nodes:
+            for sex in ["Female", "Male"]:
+                young = rand.randint(1000, 50000)
+                mature = rand.randint(5000, 200000)
+                old = rand.randint(1000, 40000)
+                fp.write(f"{node},{sex},{young + mature + old},{young},{mature},{old}\n")
+
+
+# CurrentlyInUse
+# Weighted edge list as in the wu01 commute moves file: every node has a self-loop (people working where they live)
+# plus edgesPerNode out-edges to random other nodes (fewer if there aren't that many other nodes).
+# Returns the number of edges written.
+def writeCommuteFile(filename, nodes, edgesPerNode, rand):
+    numEdges = 0
+    outDegree = min(edgesPerNode, len(nodes) - 1)
+    with open(filename, "w") as fp:
+        for n, node in enumerate(nodes):
+            fp.write(f"{node},{node},{rand.randint(1000, 100000)}\n")
+            numEdges += 1
+            for other in rand.sample(range(len(nodes) - 1), outDegree):
+                # skip over the node itself
+                destination = nodes[other + 1] if other >= n else nodes[other]
+                fp.write(f"{node},{destination},{rand.randint(1, 1000)}\n")
+                numEdges += 1
+    return numEdges
+
+
+# CurrentlyInUse
+# Writes a full set of inputs into directory and returns a dict with their filenames and the edge count
+def writeInputs(directory, numNodes, edgesPerNode, rand):
+    nodes = nodeLabels(numNodes)
+    inputs = {
+        "parameters": os.path.join(directory, "params"),
+        "population": os.path.join(directory, "population.csv"),
+        "commutes": os.path.join(directory, "commutes.csv"),
+    }
+    writeParametersFile(inputs["parameters"])
+    writePopulationFile(inputs["population"], nodes, rand)
+    inputs["edges"] = writeCommuteFile(inputs["commutes"], nodes, edgesPerNode, rand)
+    return inputs
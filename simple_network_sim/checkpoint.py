@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from . import population_engine
+
+# Bump this whenever what goes into a checkpoint changes, so old checkpoints are refused rather than misread.
+CHECKPOINT_VERSION = 1
+
+
+# CurrentlyInUse
+# Checkpoints of population_engine runs, so that a long run (or ensemble) that gets stopped part way can be picked up
+# again from the last checkpoint instead of from the start. A checkpoint is a compressed .npz file holding
+# everything the run needs to carry on exactly as it would have: the states, the time they are at, the running
+# counters, the state of the random generator (for stochastic runs), the model's transitions and mixing, and the A+I
+# time series so far. The network itself is not saved, as it comes from the input files (see loadCheckpoint).
+# Checkpoints are written to a temporary file and renamed into place, so a run killed while writing one leaves the
+# previous checkpoint intact.
+def saveCheckpoint(filename, model, states, time, counters, generator=None, timeSeriesInfection=None):
+    if timeSeriesInfection is None:
+        timeSeriesInfection = np.zeros((0,) + states.shape[:-3])
+    arrays = {
+        "version": np.array(CHECKPOINT_VERSION),
+        "time": np.array(time),
+        "states": states,
+        "counterNodes": counters["nodes"],
+        "counterTotal": counters["total"],
+        "transitions": model["transitions"],
+        "mixing": model["mixing"],
+        "timeSeriesInfection": np.asarray(timeSeriesInfection),
+        "nodes": np.array([str(node) for node in model["nodes"]]),
+        "ages": np.array(model["ages"]),
+        "compartments": np.array(model["compartments"]),
+        "generator": np.array(json.dumps(None if generator is None else generator.bit_generator.state)),
+    }
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+# CurrentlyInUse
+# Reads a checkpoint back for model, which should be compiled from the same inputs as the run that wrote it (only
+# its network is used: the transitions and mixing come from the checkpoint). Returns a dict with:
+#  - model: model with the checkpoint's parameters
+#  - states, time: the states and the time they are at
+#  - counters: the running counters, as they were
+#  - generator: a numpy.random.Generator in the same state as the run's, or None for a deterministic run
+#  - timeSeriesInfection: the A+I time series of the run up to (but not including) time
+def loadCheckpoint(filename, model):
+    with np.load(filename, allow_pickle=False) as arrays:
+        if int(arrays["version"]) != CHECKPOINT_VERSION:
+            raise ValueError(f"{filename} is a version {int(arrays['version'])} checkpoint, expected version {CHECKPOINT_VERSION}")
+        labels = {"nodes": [str(node) for node in model["nodes"]], "ages": model["ages"], "compartments": model["compartments"]}
+        for name, expected in labels.items():
+            if arrays[name].tolist() != list(expected):
+                raise ValueError(f"The {name} in {filename} don't match the model's")
+        checkpointModel = dict(model, transitions=arrays["transitions"], mixing=arrays["mixing"])
+        states = arrays["states"]
+        counters = population_engine.setUpCounters(checkpointModel, states)
+        # the running totals are kept rather than worked out again, as they are what decides when trials stop
+        counters["nodes"] = arrays["counterNodes"]
+        counters["total"] = arrays["counterTotal"]
+        generatorState = json.loads(str(arrays["generator"]))
+        generator = None
+        if generatorState is not None:
+            generator = np.random.Generator(getattr(np.random, generatorState["bit_generator"])())
+            generator.bit_generator.state = generatorState
+        return {
+            "model": checkpointModel,
+            "states": states,
+            "time": int(arrays["time"]),
+            "counters": counters,
+            "generator": generator,
+            "timeSeriesInfection": arrays["timeSeriesInfection"],
+        }
+
+
+# CurrentlyInUse
+# Observer for population_engine.runSimulation that writes a checkpoint every so many timesteps (from the start of
+# the run, not counting its first time). model, counters and generator have to be the ones the run uses.
+# timeSeriesInfection is the A+I time series from before the run, when it carries on from a checkpoint.
+def checkpointObserver(filename, model, counters, every, generator=None, timeSeriesInfection=None, startTime=0):
+    series = [] if timeSeriesInfection is None else list(timeSeriesInfection)
+
+    def observer(time, states):
+        if time > startTime and (time - startTime) % every == 0:
+            saveCheckpoint(filename, model, states, time, counters, generator, np.array(series))
+        series.append(np.copy(population_engine.getCounter(counters, "infectious")))
+
+    return observer
+
+
+# CurrentlyInUse
+# population_engine.runSimulation (without history) that writes a checkpoint to filename every so many timesteps.
+# Returns the A+I time series, as runSimulation does.
+def runWithCheckpoints(model, initialStates, timeHorizon, filename, every, observers=(), generator=None, stopThreshold=None, activeFraction=None, schedule=None):
+    counters = population_engine.setUpCounters(model, initialStates)
+    checkpointing = checkpointObserver(filename, model, counters, every, generator)
+    timeSeriesInfection, _ = population_engine.runSimulation(
+        model, initialStates, timeHorizon, keepHistory=False, observers=[checkpointing] + list(observers),
+        counters=counters, generator=generator, stopThreshold=stopThreshold, activeFraction=activeFraction,
+        schedule=schedule,
+    )
+    return timeSeriesInfection
+
+
+# CurrentlyInUse
+# Carries on the run that wrote the checkpoint in filename, up to timeHorizon, still writing a checkpoint every so
+# many timesteps (if every is given). Returns the A+I time series of the whole run, from time 0, which is exactly
+# what the run would have returned if it hadn't been stopped (given the same stopThreshold, activeFraction and
+# schedule).
+def resumeSimulation(filename, model, timeHorizon, every=None, observers=(), stopThreshold=None, activeFraction=None, schedule=None):
+    checkpoint = loadCheckpoint(filename, model)
+    model = checkpoint["model"]
+    counters = checkpoint["counters"]
+    generator = checkpoint["generator"]
+    observers = list(observers)
+    if every is not None:
+        observers.insert(0, checkpointObserver(
+            filename, model, counters, every, generator, checkpoint["timeSeriesInfection"], checkpoint["time"]
+        ))
+    timeSeriesInfection, _ = population_engine.runSimulation(
+        model, checkpoint["states"], timeHorizon, keepHistory=False, observers=observers, counters=counters,
+        generator=generator, stopThreshold=stopThreshold, activeFraction=activeFraction, startTime=checkpoint["time"],
+        schedule=schedule,
+    )
+    return np.concatenate([checkpoint["timeSeriesInfection"], timeSeriesInfection])
@@ -0,0 +1,82 @@
+import concurrent.futures
+import copy
+import random
+
+from . import network_of_populations
+
+
+# Arguments shared by every trial in a worker process, set once by _initWorker rather than pickled per trial
+_workerArgs = None
+
+
+def _initWorker(args):
+    global _workerArgs
+    _workerArgs = args
+
+
+# CurrentlyInUse
+# The random stream for a trial depends only on the master seed and the trial index, so a trial gives the same
+# result whichever process runs it and however many workers there are.
+def trialRandom(masterSeed, trial):
+    return random.Random(f"{masterSeed}-{trial}")
+
+
+def _runTrial(masterSeed, trial):
+    simulate, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates = _workerArgs
+    timeSeries = simulate(
+        rand=trialRandom(masterSeed, trial),
+        graph=graph,
+        numInfected=numInfected,
+        timeHorizon=timeHorizon,
+        genericInfection=genericInfection,
+        ageInfectionMatrix=ageInfectionMatrix,
+        diseaseProgressionProbs=diseaseProgressionProbs,
+        # the simulation writes into this, so every trial needs its own copy
+        dictOfStates=copy.deepcopy(dictOfStates),
+    )
+    return trial, list(timeSeries)
+
+
+# CurrentlyInUse
+# Runs numTrials independent trials of simulate (network_of_populations.basicSimulationInternalAgeStructure or
+# anything with the same signature, e.g. population_engine.basicSimulationInternalAgeStructure) over a pool of
+# `workers` processes, and returns the mean time series, as common.generateMeanPlot would.
+# Results are collected as they complete, and callback(trial, timeSeries) is called for each one in that order.
+# The mean is accumulated in trial order (holding back results that arrive early), so it is bit-identical for any
+# number of workers. workers=1 runs everything in this process.
+def runEnsemble(masterSeed, numTrials, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates, workers=1, simulate=network_of_populations.basicSimulationInternalAgeStructure, callback=None):
+    if numTrials < 1:
+        raise ValueError(f"An ensemble needs at least one trial, not {numTrials}")
+    args = (simulate, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates)
+
+    sumForPlot = None
+    early = {}
+    nextTrial = 0
+
+    def accumulate(trial, timeSeries):
+        nonlocal sumForPlot, nextTrial
+        if callback is not None:
+            callback(trial, timeSeries)
+        early[trial] = timeSeries
+        while nextTrial in early:
+            timeSeries = early.pop(nextTrial)
+            if sumForPlot is None:
+                sumForPlot = [0] * len(timeSeries)
+            for i, value in enumerate(timeSeries):
+                sumForPlot[i] = sumForPlot[i] + value
+            nextTrial += 1
+
+    if workers == 1:
+        _initWorker(args)
+        try:
+            for trial in range(numTrials):
+                accumulate(*_runTrial(masterSeed, trial))
+        finally:
+            _initWorker(None)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(args,)) as executor:
+            futures = [executor.submit(_runTrial, masterSeed, trial) for trial in range(numTrials)]
+            for future in concurrent.futures.as_completed(futures):
+                accumulate(*future.result())
+
+    return [float(total)/numTrials for total in sumForPlot]
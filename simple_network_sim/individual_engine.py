@@ -0,0 +1,246 @@
+import networkx as nx
+import numpy as np
+
+# State codes used in the arrays: states[i] == STATES.index(state)
+STATES = ['S', 'E', 'A', 'I', 'H', 'R', 'D']
+
+
+# NotCurrentlyInUseByCoreModel
+# Array counterpart of the discrete-time model in network_of_individuals. Everybody's state is one int8 (a code from
+# STATES) in an array indexed like model["nodes"], and the graph is turned into CSR neighbour lists once, here:
+# neighbours indices[indptr[i]:indptr[i + 1]] of individual i are the ones it can infect, each with the infection
+# probability of that edge (its weight, or genericInfection if it has none, as in network_of_individuals.doInfection).
+# fromStateTrans (from network_of_populations.setUpParametersVanilla) becomes a table of cumulative probabilities,
+# cumulative[s, j] being the chance of going to one of STATES[:j + 1] from STATES[s] in a timestep, so choosing the
+# next state is a binary search instead of a scan of the distribution.
+# A network already in CSR form (e.g. from generateHouseholdNetwork) can be passed in instead of the graph, in which
+# case the individuals are numbered 0, 1, ... and every edge has probability genericInfection unless the network
+# has "weights".
+def compileModel(graph, fromStateTrans, genericInfection, network=None):
+    if network is None:
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        indices = []
+        probs = []
+        for i, (vertex, neighbours) in enumerate(graph.adjacency()):
+            for neigh, edge in neighbours.items():
+                indices.append(index[neigh])
+                probs.append(edge.get('weight', genericInfection))
+            indptr[i + 1] = len(indices)
+    else:
+        nodes = range(len(network["indptr"]) - 1)
+        indptr = network["indptr"]
+        indices = network["indices"]
+        probs = network.get("weights", np.full(len(indices), genericInfection))
+    indexType = np.int32 if len(nodes) < 2**31 else np.int64
+
+    transitions = np.zeros((len(STATES), len(STATES)))
+    for s, state in enumerate(STATES):
+        if state not in fromStateTrans:
+            transitions[s, s] = 1.0
+            continue
+        for nextState, prob in fromStateTrans[state].items():
+            transitions[s, STATES.index(nextState)] += prob
+
+    return {
+        "nodes": nodes,
+        "indptr": indptr,
+        "indices": np.array(indices, dtype=indexType),
+        "probs": np.array(probs, dtype=float),
+        "cumulative": np.cumsum(transitions, axis=1),
+        "moving": [s for s in range(len(STATES)) if transitions[s, s] < 1.0],
+    }
+
+
+# NotCurrentlyInUseByCoreModel
+# states is a dict like dictOfStates[time] in network_of_individuals, i.e. node -> state
+def statesToArray(model, states):
+    codes = {state: s for s, state in enumerate(STATES)}
+    return np.array([codes[states[node]] for node in model["nodes"]], dtype=np.int8)
+
+
+# NotCurrentlyInUseByCoreModel
+def arrayToStates(model, states):
+    return {node: STATES[s] for node, s in zip(model["nodes"], states.tolist())}
+
+
+# NotCurrentlyInUseByCoreModel
+# Vectorised network_of_individuals.doProgression: one pass per state that people leave, with a uniform draw each
+# looked up in that state's cumulative probabilities. Returns the new states.
+def doProgression(model, states, generator):
+    nextStates = states.copy()
+    for s in model["moving"]:
+        who = np.flatnonzero(states == s)
+        if len(who) == 0:
+            continue
+        cumulative = model["cumulative"][s]
+        chosen = np.searchsorted(cumulative, generator.random(len(who)))
+        # rounding can leave the last cumulative probability a hair under 1
+        nextStates[who] = np.minimum(chosen, len(STATES) - 1)
+    return nextStates
+
+
+# NotCurrentlyInUseByCoreModel
+# Vectorised network_of_individuals.doInfection: every edge from an infectious (A or I) individual to a susceptible
+# one is tried at once, with a single batch of uniform draws. Returns the indices of the newly infected.
+def doInfection(model, states, generator):
+    indptr = model["indptr"]
+    infectious = np.flatnonzero((states == STATES.index('A')) | (states == STATES.index('I')))
+    starts = indptr[infectious]
+    lengths = indptr[infectious + 1] - starts
+    # positions in indices of all the edges out of the infectious individuals
+    offsets = np.cumsum(lengths) - lengths
+    edges = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+    targets = model["indices"][edges]
+    susceptible = states[targets] == STATES.index('S')
+    targets = targets[susceptible]
+    infected = generator.random(len(targets)) <= model["probs"][edges[susceptible]]
+    return np.unique(targets[infected])
+
+
+# NotCurrentlyInUseByCoreModel
+def countInfections(states):
+    return int(np.count_nonzero((states == STATES.index('A')) | (states == STATES.index('I'))))
+
+
+# NotCurrentlyInUseByCoreModel
+# Same model as network_of_individuals.basicSimulation, with generator a numpy.random.Generator (e.g.
+# numpy.random.default_rng(seed)). Returns the number infectious at each time from 0 to timeHorizon - 1, and the
+# states at timeHorizon.
+def basicSimulation(generator, model, numInfected, timeHorizon):
+    timeSeriesInfection = []
+    # choose a random set of initially infected
+    states = np.zeros(len(model["nodes"]), dtype=np.int8)
+    states[generator.integers(len(model["nodes"]), size=numInfected)] = STATES.index('I')
+
+    for time in range(timeHorizon):
+        nextStates = doProgression(model, states, generator)
+        nextStates[doInfection(model, states, generator)] = STATES.index('E')
+        timeSeriesInfection.append(countInfections(states))
+        states = nextStates
+
+    return timeSeriesInfection, states
+
+
+# Household sizes to choose from, as in network_of_individuals.generateHouseholds
+HOUSEHOLD_SIZES = [1, 1, 2, 2, 2, 2, 3, 4, 4, 3, 3, 2]
+
+
+# NotCurrentlyInUseByCoreModel
+# Array version of network_of_individuals.generateHouseholds, for city-sized populations. Households are placed
+# uniformly at random in the unit square and two households are neighbours if they are within radius of each other
+# (as with nx.random_geometric_graph). Everybody is in contact with everybody else in their own household and in
+# the neighbouring ones.
+# Neighbours are found by putting the households into a grid of cells at least radius wide, so only households in
+# adjacent cells are ever compared, and the contacts are generated in batches of households with the same sizes.
+# Returns a dict with:
+#  - indptr, indices: the individual-level contact network in CSR form (both directions of every contact), which
+#    compileModel accepts as network; individuals are numbered household by household
+#  - household, member: for each individual, its household and its number within the household
+#  - positions: position of each household, indexed [household, axis]
+#  - neighbourhoods: the household-level network in CSR form, as a dict with indptr and indices
+def generateHouseholdNetwork(generator, numHouseholds, radius, householdSizes=HOUSEHOLD_SIZES):
+    positions = generator.random((numHouseholds, 2))
+    sizes = generator.choice(np.array(householdSizes, dtype=np.int64), size=numHouseholds)
+    firstMember = np.concatenate([[0], np.cumsum(sizes)])
+    household = np.repeat(np.arange(numHouseholds), sizes)
+    member = np.arange(firstMember[-1]) - firstMember[household]
+
+    first, second = _findNeighbourHouseholds(positions, radius)
+    neighbourhoods = _symmetricCSR(numHouseholds, first, second)
+
+    # everybody in a household with everybody else in it, in both directions already
+    withinSources = []
+    withinTargets = []
+    for size in np.unique(sizes):
+        homes = np.flatnonzero(sizes == size)
+        a, b = np.nonzero(~np.eye(size, dtype=bool))
+        withinSources.append((firstMember[homes][:, np.newaxis] + a).ravel())
+        withinTargets.append((firstMember[homes][:, np.newaxis] + b).ravel())
+    # and with everybody in the neighbouring households, in one direction (_symmetricCSR adds the other)
+    sources = []
+    targets = []
+    for firstSize in np.unique(sizes):
+        for secondSize in np.unique(sizes):
+            pairs = np.flatnonzero((sizes[first] == firstSize) & (sizes[second] == secondSize))
+            if len(pairs) == 0:
+                continue
+            a, b = np.divmod(np.arange(firstSize*secondSize), secondSize)
+            sources.append((firstMember[first[pairs]][:, np.newaxis] + a).ravel())
+            targets.append((firstMember[second[pairs]][:, np.newaxis] + b).ravel())
+    contacts = _symmetricCSR(
+        len(household),
+        np.concatenate(sources or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate(targets or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate(withinSources or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate(withinTargets or [np.zeros(0, dtype=np.int64)]),
+    )
+
+    return {
+        "indptr": contacts["indptr"],
+        "indices": contacts["indices"],
+        "household": household,
+        "member": member,
+        "positions": positions,
+        "neighbourhoods": neighbourhoods,
+    }
+
+
+# Pairs (i, j), i < j, of points within radius of each other
+def _findNeighbourHouseholds(positions, radius):
+    # cells at least radius wide, but not so many more cells than points
+    cellSize = max(radius, 1.0/np.ceil(np.sqrt(len(positions)) or 1.0))
+    numCells = int(np.ceil(1.0/cellSize)) + 1
+    cells = np.minimum((positions // cellSize).astype(np.int64), numCells - 1)
+    cellIds = cells[:, 0]*numCells + cells[:, 1]
+    order = np.argsort(cellIds, kind="stable")
+    starts = np.searchsorted(cellIds[order], np.arange(numCells*numCells + 1))
+
+    first = []
+    second = []
+    # each pair of adjacent cells once: the cell itself and half of its neighbours
+    for dx, dy in [(0, 0), (0, 1), (1, -1), (1, 0), (1, 1)]:
+        neighbourCells = cells + [dx, dy]
+        valid = np.all((neighbourCells >= 0) & (neighbourCells < numCells), axis=1)
+        points = np.flatnonzero(valid)
+        neighbourIds = neighbourCells[points, 0]*numCells + neighbourCells[points, 1]
+        counts = starts[neighbourIds + 1] - starts[neighbourIds]
+        offsets = np.cumsum(counts) - counts
+        candidates = order[np.repeat(starts[neighbourIds] - offsets, counts) + np.arange(counts.sum())]
+        points = np.repeat(points, counts)
+        if dx == 0 and dy == 0:
+            keep = points < candidates
+            points, candidates = points[keep], candidates[keep]
+        distances = ((positions[points] - positions[candidates])**2).sum(axis=1)
+        close = distances <= radius*radius
+        first.append(np.minimum(points[close], candidates[close]))
+        second.append(np.maximum(points[close], candidates[close]))
+    return np.concatenate(first), np.concatenate(second)
+
+
+# CSR form of the edges (sources[i], targets[i]) in both directions, plus the directed edges in extraSources and
+# extraTargets, with each row sorted
+def _symmetricCSR(numNodes, sources, targets, extraSources=(), extraTargets=()):
+    allSources = np.concatenate([sources, targets, extraSources]).astype(np.int64)
+    allTargets = np.concatenate([targets, sources, extraTargets]).astype(np.int64)
+    # a single sort on one key is a lot quicker than np.lexsort
+    order = np.argsort(allSources*numNodes + allTargets)
+    indptr = np.zeros(numNodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(allSources, minlength=numNodes), out=indptr[1:])
+    indexType = np.int32 if numNodes < 2**31 else np.int64
+    return {"indptr": indptr, "indices": allTargets[order].astype(indexType)}
+
+
+# NotCurrentlyInUseByCoreModel
+# networkx version of the individual-level network from generateHouseholdNetwork, with individuals labelled
+# (household, member) as in network_of_individuals.generateHouseholds
+def householdNetworkToGraph(network):
+    labels = list(zip(network["household"].tolist(), network["member"].tolist()))
+    graph = nx.Graph()
+    graph.add_nodes_from(labels)
+    sources = np.repeat(np.arange(len(labels)), np.diff(network["indptr"]))
+    graph.add_edges_from((labels[i], labels[j]) for i, j in zip(sources.tolist(), network["indices"].tolist()))
+    return graph
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from . import loaders
+
+# Bump this whenever a loader's output, or the way it is stored here, changes: old cache entries are then ignored.
+CACHE_VERSION = 1
+
+
+# CurrentlyInUse
+# Caching versions of the loaders. Each function takes the same arguments as its namesake in loaders, plus the
+# directory to keep the cache in, and returns the same thing. The first time a file is read it is parsed by the
+# loader and the result is stored as an .npz file named after the loader, CACHE_VERSION and a hash of the file's
+# contents. Later reads of the same contents load that instead of parsing the text, and an edited file simply gets
+# a new entry. Entries are written to a temporary file and renamed into place, so many processes can share a cache.
+def readParametersAgeStructured(filename, cacheDir):
+    return _cachedLoad("parameters", filename, cacheDir, loaders.readParametersAgeStructured, _encodeParameters, _decodeParameters)
+
+
+# CurrentlyInUse
+def readPopulationAgeStructured(filename, cacheDir):
+    return _cachedLoad("population", filename, cacheDir, loaders.readPopulationAgeStructured, _encodePopulation, _decodePopulation)
+
+
+# CurrentlyInUse
+def readEdgeListArrays(filename, cacheDir):
+    return _cachedLoad("edges", filename, cacheDir, loaders.readEdgeListArrays, _encodeEdges, _decodeEdges)
+
+
+# CurrentlyInUse
+def genGraphFromContactFile(filename, cacheDir):
+    return loaders.edgeArraysToGraph(*readEdgeListArrays(filename, cacheDir))
+
+
+# CurrentlyInUse
+def readNodeAttributesJSON(filename, cacheDir):
+    return _cachedLoad("attributes", filename, cacheDir, loaders.readNodeAttributesJSON, _encodeJSON, _decodeJSON)
+
+
+def fileHash(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cacheFilename(cacheDir, kind, filename):
+    return os.path.join(cacheDir, f"{kind}-v{CACHE_VERSION}-{fileHash(filename)}.npz")
+
+
+def _cachedLoad(kind, filename, cacheDir, load, encode, decode):
+    cached = cacheFilename(cacheDir, kind, filename)
+    if os.path.exists(cached):
+        try:
+            with np.load(cached, allow_pickle=False) as arrays:
+                return decode(arrays)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            print(f"WARNING: ignoring unreadable cache entry {cached}")
+
+    result = load(filename)
+    os.makedirs(cacheDir, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=cacheDir, suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **encode(result))
+        os.replace(temporary, cached)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return result
+
+
+def _encodeParameters(agesDictionary):
+    ages, names, values = [], [], []
+    for age, params in agesDictionary.items():
+        for name, value in params.items():
+            ages.append(age)
+            names.append(name)
+            values.append(value)
+    return {"ages": np.array(ages, dtype=str), "names": np.array(names, dtype=str), "values": np.array(values, dtype=float)}
+
+
+def _decodeParameters(arrays):
+    agesDictionary = {}
+    for age, name, value in zip(arrays["ages"].tolist(), arrays["names"].tolist(), arrays["values"].tolist()):
+        agesDictionary.setdefault(age, {})[name] = value
+    return agesDictionary
+
+
+def _encodePopulation(dictOfPops):
+    boards, sexes, keys, values = [], [], [], []
+    for board, bySex in dictOfPops.items():
+        for sex, byAge in bySex.items():
+            for key, value in byAge.items():
+                boards.append(board)
+                sexes.append(sex)
+                keys.append(key)
+                values.append(value)
+    return {
+        "boards": np.array(boards, dtype=str),
+        "sexes": np.array(sexes, dtype=str),
+        "keys": np.array(keys, dtype=str),
+        "values": np.array(values, dtype=np.int64),
+    }
+
+
+def _decodePopulation(arrays):
+    dictOfPops = {}
+    columns = [arrays[name].tolist() for name in ["boards", "sexes", "keys", "values"]]
+    for board, sex, key, value in zip(*columns):
+        dictOfPops.setdefault(board, {}).setdefault(sex, {})[key] = value
+    return dictOfPops
+
+
+def _encodeEdges(edges):
+    nodes, sources, targets, weights = edges
+    return {"nodes": np.array(nodes, dtype=str), "sources": sources, "targets": targets, "weights": weights}
+
+
+def _decodeEdges(arrays):
+    return arrays["nodes"].tolist(), arrays["sources"], arrays["targets"], arrays["weights"]
+
+
+def _encodeJSON(data):
+    return {"json": np.array(json.dumps(data))}
+
+
+def _decodeJSON(arrays):
+    return json.loads(str(arrays["json"]))
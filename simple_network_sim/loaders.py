@@ -1,6 +1,8 @@
+import csv
 import json
 
 import networkx as nx
+import numpy as np
 
 
 # CurrentlyInUse
@@ -107,11 +109,87 @@ def readNodeAttributesJSON(filename):
 
 
 # CurrentlyInUse
-# at the moment this uses vanilla networkx edge list reading - needs weights
-#  I've set it apart as its own function in case we want to do anything fancier with edge files
-# in future - e.g. sampling, generating movements, whatever
+# Bulk reader for the weighted edge list format of the commute moves files (source,destination,weight), which goes
+# straight to arrays instead of building a graph edge by edge.
+# Returns (nodes, sources, targets, weights): nodes is the list of labels in order of first appearance (the order
+# networkx would add them in), sources and targets are integer indices into it, and weights are floats. Repeated
+# edges are combined into one, with their weights added up. Self-loops are kept.
+def readEdgeListArrays(filename):
+    with open(filename, 'r') as f:
+        text = f.read()
+    lines = text.splitlines()
+    if "#" in text:
+        lines = [line.split("#", 1)[0] for line in lines]
+    lines = [line for line in map(str.strip, lines) if line]
+    if not lines:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    # every line has to be checked, as misaligned lines can still add up to the right number of fields
+    for line in lines:
+        if line.count(",") != 2:
+            raise Exception(f"Error: Malformed input \"{line}\" in {filename}")
+    fields = ",".join(lines).split(",")
+    try:
+        weights = np.array(fields[2::3], dtype=float)
+    except ValueError as e:
+        raise ValueError(f"Error: Malformed weight in {filename}: {e}") from None
+
+    # what's left is the endpoints in file order (source, destination, source, ...), so the dict keys come out in
+    # order of first appearance, which is the order networkx would add the nodes in
+    del fields[2::3]
+    nodes = list(dict.fromkeys(fields))
+    nodeIndex = {node: i for i, node in enumerate(nodes)}
+    indices = np.array(list(map(nodeIndex.__getitem__, fields)), dtype=np.int64)
+    numNodes = len(nodes)
+
+    keys, edgeOf = np.unique(indices[0::2] * numNodes + indices[1::2], return_inverse=True)
+    weights = np.bincount(edgeOf.ravel(), weights=weights, minlength=len(keys))
+    return nodes, keys // numNodes, keys % numNodes, weights
+
+
+# CurrentlyInUse
+# networkx adapter for the output of readEdgeListArrays
+def edgeArraysToGraph(nodes, sources, targets, weights):
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_weighted_edges_from(
+        (nodes[source], nodes[target], weight)
+        for source, target, weight in zip(sources.tolist(), targets.tolist(), weights.tolist())
+    )
+    return G
+
+
+# CurrentlyInUse
 # it should return a networkx graph, ideally with weighted edges
+# This reads the file with readEdgeListArrays (so repeated edges have their weights added up) and then builds the
+# graph in one go. Code that doesn't need networkx can use readEdgeListArrays directly, e.g. with
+# network_of_populations.compileNetworkFromArrays.
 # eventual replacement with HDF5 reading code?
 def genGraphFromContactFile(filename):
-    G = nx.read_edgelist(filename, create_using=nx.DiGraph, delimiter=",", data=(('weight', float),))
-    return G
+    return edgeArraysToGraph(*readEdgeListArrays(filename))
+
+
+# CurrentlyInUse
+# Reads a square mixing matrix, like sample_20200327_comix_social_contacts.sampleCSV: the first row has the column
+# labels (after an empty first cell) and every other row starts with its label. Returns a dict of dicts, with
+# matrix[rowLabel][columnLabel] the entry in that row and column, which for COMIX is the mean number of contacts a
+# participant in the row's age band has with people in the column's age band (the same way round as
+# ageInfectionMatrix, see network_of_populations.doInternalInfectionProcess).
+def readMixingMatrix(filename):
+    # utf-8-sig, as the COMIX files start with a byte order mark
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = [row for row in csv.reader(f) if row]
+    if not rows:
+        raise ValueError(f"{filename} is empty")
+    columns = [label.strip() for label in rows[0][1:]]
+    matrix = {}
+    for row in rows[1:]:
+        label = row[0].strip()
+        if len(row) != len(columns) + 1:
+            raise ValueError(f"Row \"{label}\" in {filename} has {len(row) - 1} entries, expected {len(columns)}")
+        try:
+            matrix[label] = {column: float(value) for column, value in zip(columns, row[1:])}
+        except ValueError:
+            raise ValueError(f"Row \"{label}\" in {filename} has a value that isn't a number") from None
+    if sorted(matrix) != sorted(columns):
+        raise ValueError(f"The row labels in {filename} don't match the column labels")
+    return matrix
@@ -1,3 +1,6 @@
+import heapq
+import itertools
+import math
 import random
 from collections import Counter
 
@@ -61,7 +64,8 @@ def checkForParameters(dictOfParams, ageStructured):
 # NotCurrentlyInUseByCoreModel
 # Simplest sensible model: no age classes, uniform transitions between states
 # each vertex will have a state at each timestep
-def doProgression(dictOfStates, currentTime):
+# fromStateTrans is as returned by network_of_populations.setUpParametersVanilla
+def doProgression(dictOfStates, currentTime, fromStateTrans):
     # currentTime = max(dictOfStates.values())
     nextTime = currentTime + 1
     currStates = dictOfStates[currentTime]
@@ -99,7 +103,7 @@ def doInfection(graph, dictOfStates, currentTime, genericInfectionProb):
 
 
 # NotCurrentlyInUseByCoreModel
-def prettyPrint(dictOfStates, time):
+def prettyPrint(dictOfStates, time, fromStateTrans):
     states = ['S']
     stateString = 'S,'
     for state in fromStateTrans:
@@ -123,7 +127,7 @@ def countInfections(dictOfStates, time):
 
 
 # NotCurrentlyInUseByCoreModel
-def basicSimulation(graph, numInfected, timeHorizon, genericInfection):
+def basicSimulation(graph, numInfected, timeHorizon, genericInfection, fromStateTrans):
     timeSeriesInfection = []
     # choose a random set of initially infected
     infected = random.choices(list(graph.nodes()), k=numInfected)
@@ -134,7 +138,7 @@ def basicSimulation(graph, numInfected, timeHorizon, genericInfection):
         dictOfStates[0][vertex] = 'I'
 
     for time in range(timeHorizon):
-        doProgression(dictOfStates, time)
+        doProgression(dictOfStates, time, fromStateTrans)
         doInfection(graph, dictOfStates, time, genericInfection)
         timeSeriesInfection.append(countInfections(dictOfStates, time))
 
@@ -142,6 +146,88 @@ def basicSimulation(graph, numInfected, timeHorizon, genericInfection):
 
 
 # NotCurrentlyInUseByCoreModel
+# Event-driven, continuous-time version of basicSimulation, whose cost is proportional to the number of things that
+# happen (transitions, and infections along edges) rather than to the number of individuals times timesteps.
+# The per-timestep probabilities are turned into rates with the same chance of happening within one unit of time:
+#  - someone in a state they stay in with probability p leaves at rate -ln(p), going to each other state with
+#    probability proportional to its entry in fromStateTrans
+#  - an infectious (A or I) individual infects each susceptible neighbour at rate -ln(1 - w), where w is the weight
+#    of the edge, or genericInfection if it has none
+# Pending events are kept in a heap. Because the waiting times are exponential, the infections an individual can
+# cause are drawn each time it enters A or I, only up to the time it leaves that state, and only the earliest one
+# per susceptible is kept, so every event popped from the heap either happens or is skipped as out of date.
+# states is filled in with the state of each individual at timeHorizon; the time series has the number infectious
+# at each whole time from 0 to timeHorizon - 1, as with basicSimulation.
+def eventDrivenSimulation(rand, graph, numInfected, timeHorizon, genericInfection, fromStateTrans, states=None):
+    if states is None:
+        states = {}
+    for guy in graph.nodes():
+        states[guy] = 'S'
+
+    heap = []
+    # breaks ties between events at the same time, so that vertices and tags never get compared
+    order = itertools.count()
+    version = dict.fromkeys(states, 0)
+    leaveTime = {}
+    pendingInfection = {}
+    numInfectious = 0
+
+    def enterState(vertex, state, time):
+        nonlocal numInfectious
+        if states[vertex] in ('A', 'I'):
+            numInfectious -= 1
+        if state in ('A', 'I'):
+            numInfectious += 1
+        states[vertex] = state
+        version[vertex] += 1
+        leaveTime[vertex] = math.inf
+        distrib = fromStateTrans.get(state, {})
+        stay = distrib.get(state, 0.0)
+        if distrib and stay < 1.0:
+            wait = rand.expovariate(-math.log(stay)) if stay > 0.0 else 0.0
+            leaveTime[vertex] = time + wait
+            heapq.heappush(heap, (time + wait, next(order), True, vertex, version[vertex]))
+        if state in ('A', 'I'):
+            for neigh, edge in graph.adj[vertex].items():
+                if states[neigh] != 'S':
+                    continue
+                probabilityOfInfection = edge.get('weight', genericInfection)
+                if probabilityOfInfection <= 0.0:
+                    continue
+                wait = rand.expovariate(-math.log(1.0 - probabilityOfInfection)) if probabilityOfInfection < 1.0 else 0.0
+                if time + wait < leaveTime[vertex] and time + wait < pendingInfection.get(neigh, math.inf):
+                    pendingInfection[neigh] = time + wait
+                    heapq.heappush(heap, (time + wait, next(order), False, neigh, None))
+
+    # choose a random set of initially infected
+    for vertex in rand.choices(list(graph.nodes()), k=numInfected):
+        if states[vertex] != 'I':
+            enterState(vertex, 'I', 0.0)
+
+    timeSeriesInfection = []
+    # everything that happens before timeHorizon counts towards the states at timeHorizon, including what happens
+    # after the last time in the time series
+    while heap and heap[0][0] < timeHorizon:
+        time, _, isProgression, vertex, tag = heapq.heappop(heap)
+        while len(timeSeriesInfection) < timeHorizon and len(timeSeriesInfection) <= time:
+            timeSeriesInfection.append(numInfectious)
+        if isProgression:
+            if tag != version[vertex]:
+                continue
+            distrib = fromStateTrans[states[vertex]]
+            nextStates = [state for state in distrib if state != states[vertex]]
+            enterState(vertex, rand.choices(nextStates, weights=[distrib[state] for state in nextStates])[0], time)
+        elif states[vertex] == 'S' and pendingInfection.get(vertex) == time:
+            del pendingInfection[vertex]
+            enterState(vertex, 'E', time)
+    while len(timeSeriesInfection) < timeHorizon:
+        timeSeriesInfection.append(numInfectious)
+    return timeSeriesInfection
+
+
+# NotCurrentlyInUseByCoreModel
+# For large numbers of households use individual_engine.generateHouseholdNetwork, which builds the same kind of
+# network as arrays (and can convert it to networkx)
 def generateHouseholds(numHouseholds, radius, locations, householdMembership, withinNeighbourhood):
     # generate a random geometric graph for households in range:
     randomGeometric = nx.random_geometric_graph(numHouseholds, radius)
@@ -1,3 +1,9 @@
+
+import numpy as np
+
+from . import profiling
+
+
 # NotCurrentlyInUse
 # This needs amendment to have different node populations and age structure
 # Right now it is a framework function, to allow ongoing dev - uniform age structure in each,
@@ -35,6 +41,33 @@ def setUpParametersAges(dictByAge):
     return ageToStateTrans
 
 
+# CurrentlyInUse
+# Compiled form of setUpParametersAges: transitions[a, i, j] is the probability that someone of ages[a] in
+# compartments[i] moves to compartments[j] in one timestep, so progression for every node is a single batched
+# matrix product. Compartments without outward transitions ('S', which only moves by infection) stay put.
+# Every row has to be a probability distribution, otherwise people appear or vanish during the run, so we check
+# that here and report all the offending rows at once.
+def setUpTransitionMatrices(ageToStateTrans, ages, compartments):
+    transitions = np.zeros((len(ages), len(compartments), len(compartments)))
+    problems = []
+    for a, age in enumerate(ages):
+        for i, state in enumerate(compartments):
+            if state not in ageToStateTrans[age]:
+                transitions[a, i, i] = 1.0
+                continue
+            for nextState, prob in ageToStateTrans[age][state].items():
+                if nextState not in compartments:
+                    problems.append(f"age \"{age}\" state \"{state}\" moves to unknown state \"{nextState}\"")
+                    continue
+                transitions[a, i, compartments.index(nextState)] += prob
+            row = transitions[a, i]
+            if (row < 0).any() or (row > 1).any() or not np.isclose(row.sum(), 1.0):
+                problems.append(f"age \"{age}\" state \"{state}\" has transition probabilities {list(row)}")
+    if problems:
+        raise ValueError("Invalid transition probabilities: " + "; ".join(problems))
+    return transitions
+
+
 # CurrentlyInUse
 def countInfectionsAgeStructured(dictOfStates, time):
     total = 0
@@ -45,6 +78,21 @@ def countInfectionsAgeStructured(dictOfStates, time):
     return total
 
 
+# States of people still going through the disease
+ACTIVE_STATES = ['E', 'A', 'I', 'H']
+
+
+# CurrentlyInUse
+# Number of people in ACTIVE_STATES, for detecting that the epidemic is over
+def countActiveAgeStructured(dictOfStates, time):
+    total = 0
+    for node in dictOfStates[time]:
+        for (age, state) in dictOfStates[time][node]:
+            if state in ACTIVE_STATES:
+                total = total + dictOfStates[time][node][(age, state)]
+    return total
+
+
 # NotCurrentlyInUse
 # this takes a dictionary of states at times at nodes, and returns a string
 # reporting the number of people in each state at each node at each time.
@@ -81,7 +129,12 @@ def basicReportingFunction(dictOfStates):
 
 # CurrentlyInUse
 # amending this so that file I/O happens outside it 
-def basicSimulationInternalAgeStructure(rand, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates):
+# Pass a profile from profiling.newProfile() to get the time spent and work done in each phase of the loop
+# If stopThreshold is given, the run stops as soon as no more than that many people are in E, A, I or H (so 0 means
+# once the epidemic has died out), and the states are frozen from then on: the time series is padded with its last
+# value and every later time in dictOfStates is one and the same copy of the last states computed (so changing the
+# states at one of those times changes them all).
+def basicSimulationInternalAgeStructure(rand, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates, profile=None, stopThreshold=None):
     
     print('WARNING - FUNCTION NOT PROPERLY TESTED YET - basicSimulationInternalAgeStructure')
     ages = list(ageInfectionMatrix.values())
@@ -97,24 +150,55 @@ def basicSimulationInternalAgeStructure(rand, graph, numInfected, timeHorizon, g
     for vertex in infectedNode:
         dictOfStates[0][vertex][('m', 'E')] = numInfected 
 
+    start = profiling.startPhase(profile)
+    network = compileNetwork(graph)
+    profiling.addCounts(profile, edgesEvaluated=graph.number_of_edges())
+    profiling.endPhase(profile, "compileNetwork", start, 0)
+    summariesCache = {}
+
     for time in range(timeHorizon):
+        if stopThreshold is not None and countActiveAgeStructured(dictOfStates, time) <= stopThreshold:
+            lastCount = countInfectionsAgeStructured(dictOfStates, time)
+            # one copy for all the later times, so the padding costs a single copy of the states, not one per step
+            frozen = {node: dict(nodeState) for node, nodeState in dictOfStates[time].items()}
+            for laterTime in range(time, timeHorizon):
+                timeSeriesInfection.append(lastCount)
+                dictOfStates[laterTime + 1] = frozen
+            break
 #         make sure the next time exists, so that we can add exposed individuals to it
+#         (and isn't the frozen states an earlier run with a stopThreshold left for all the times after it stopped)
+        start = profiling.startPhase(profile)
         nextTime = time+1
-        if nextTime not in dictOfStates:
+        if nextTime not in dictOfStates or dictOfStates[nextTime] is dictOfStates.get(nextTime + 1):
             dictOfStates[nextTime] = {}
             for node in graph.nodes():
                 dictOfStates[nextTime][node] = {}
                 for age in ages:
                     for state in states:
                         dictOfStates[nextTime][node][(age, state)] = 0
+            profiling.addCounts(profile, nodesVisited=len(dictOfStates[nextTime]), dictAllocations=len(dictOfStates[nextTime]) + 1)
+        profiling.endPhase(profile, "nextTimeSetup", start, time)
         
-        doInternalProgressionAllNodes(dictOfStates, time, diseaseProgressionProbs)
+        start = profiling.startPhase(profile)
+        doInternalProgressionAllNodes(dictOfStates, time, diseaseProgressionProbs, profile)
+        profiling.endPhase(profile, "progression", start, time)
         
-        doInteralInfectionProcessAllNodes(dictOfStates, ageInfectionMatrix, ages, time)
+        start = profiling.startPhase(profile)
+        nodeSummaries = getNodeSummaries(summariesCache, dictOfStates, time, profile)
+        profiling.endPhase(profile, "nodeSummaries", start, time)
+
+        start = profiling.startPhase(profile)
+        doInteralInfectionProcessAllNodes(dictOfStates, ageInfectionMatrix, ages, time, nodeSummaries, profile)
+        profiling.endPhase(profile, "internalInfection", start, time)
  
-        doBetweenInfectionAgeStructured(graph, dictOfStates, time, genericInfection)
+        start = profiling.startPhase(profile)
+        doBetweenInfectionAgeStructured(graph, dictOfStates, time, genericInfection, network, nodeSummaries, profile)
+        profiling.endPhase(profile, "betweenInfection", start, time)
 
+        start = profiling.startPhase(profile)
         timeSeriesInfection.append(countInfectionsAgeStructured(dictOfStates, time))
+        profiling.addCounts(profile, nodesVisited=len(dictOfStates[time]))
+        profiling.endPhase(profile, "countInfections", start, time)
 
     return timeSeriesInfection
 
@@ -159,6 +243,40 @@ def getTotalSuscept(nodeState):
     return totalSusHere
 
 
+# CurrentlyInUse
+# The totals the infection phases need for one node, added up in the same order as totalIndividuals,
+# getTotalInfected, getTotalSuscept and getTotalInAge, so they are bit-identical to calling those.
+def summariseNode(nodeState):
+    totalsByAge = {}
+    totalInfected = 0
+    totalSuscept = 0
+    for (age, state) in nodeState:
+        totalsByAge[age] = totalsByAge.get(age, 0) + nodeState[(age, state)]
+        if state == 'A' or state == 'I':
+            totalInfected = totalInfected + nodeState[(age, state)]
+        elif state == 'S':
+            totalSuscept = totalSuscept + nodeState[(age, state)]
+    return {
+        "total": totalIndividuals(nodeState),
+        "infected": totalInfected,
+        "suscept": totalSuscept,
+        "byAge": totalsByAge,
+    }
+
+
+# CurrentlyInUse
+# Node summaries for dictOfStates[time], shared by the phases of a timestep. cache is a dict owned by the caller
+# (start with {}): the summaries are only recomputed when asked for a different time (or a different set of
+# states), so they are dropped automatically as the simulation moves on to the next step.
+def getNodeSummaries(cache, dictOfStates, time, profile=None):
+    if cache.get("time") != time or cache.get("states") is not dictOfStates[time]:
+        cache["time"] = time
+        cache["states"] = dictOfStates[time]
+        cache["summaries"] = {node: summariseNode(dictOfStates[time][node]) for node in dictOfStates[time]}
+        profiling.addCounts(profile, nodesVisited=len(dictOfStates[time]), dictAllocations=2*len(dictOfStates[time]) + 1)
+    return cache["summaries"]
+
+
 # CurrentlyInUse
 # fractional people will come out of this
 # right now this infects uniformly across age class by number of susceptibles in age class 
@@ -180,35 +298,118 @@ def distributeInfections(nodeState, newInfections):
     return newInfectionsByAge
 
 
+# CurrentlyInUse
+# Compiles the movement graph into compressed sparse row (CSR) form, with one row per *receiving* node:
+# the givers of row i are indices[indptr[i]:indptr[i+1]], with matching edge weights.
+# Self-loops are dropped (within-node mixing is handled by the age matrix), and missing weights default to 1.0.
+# Doing this once per run means each step only needs one sparse matrix-vector product (csrMatVec).
+def compileNetwork(graph, nodes=None):
+    if nodes is None:
+        nodes = list(graph.nodes())
+    nodeIndex = {node: i for i, node in enumerate(nodes)}
+    sources = []
+    targets = []
+    weights = []
+    for (givingVertex, receivingVertex, data) in graph.edges(data=True):
+        if 'weight' not in data:
+            print("ERROR: No weight available for edge " + str(givingVertex) + "," + str(receivingVertex) + " assigning weight 1.0")
+        sources.append(nodeIndex[givingVertex])
+        targets.append(nodeIndex[receivingVertex])
+        weights.append(data.get('weight', 1.0))
+    return compileNetworkFromArrays(nodes, sources, targets, weights)
+
+
+# CurrentlyInUse
+# sources/targets are integer indices into nodes. Duplicate edges have their weights summed.
+def compileNetworkFromArrays(nodes, sources, targets, weights):
+    numNodes = len(nodes)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    weights = np.asarray(weights, dtype=float)
+    keep = sources != targets
+    keys, inverse = np.unique(targets[keep] * numNodes + sources[keep], return_inverse=True)
+    indptr = np.zeros(numNodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // numNodes, minlength=numNodes), out=indptr[1:])
+    return {
+        "nodes": list(nodes),
+        "indptr": indptr,
+        "indices": keys % numNodes,
+        "weights": np.bincount(inverse, weights=weights[keep], minlength=len(keys)),
+    }
+
+
+# CurrentlyInUse
+# result[i] = sum of weight * values[giver] over the edges into node i
+# values is indexed by node along its first axis, any further axes are carried along (e.g. trials)
+def csrMatVec(network, values):
+    values = np.asarray(values, dtype=float)
+    indptr = network["indptr"]
+    result = np.zeros((len(indptr) - 1,) + values.shape[1:])
+    nonEmpty = indptr[:-1] < indptr[1:]
+    if nonEmpty.any():
+        weights = network["weights"].reshape((-1,) + (1,) * (values.ndim - 1))
+        result[nonEmpty] = np.add.reduceat(weights * values[network["indices"]], indptr[:-1][nonEmpty], axis=0)
+    return result
+
+
+# CurrentlyInUse
+# The same network with one row per *giving* node instead, i.e. indices[indptr[i]:indptr[i+1]] are the nodes that
+# node i gives to
+def csrTranspose(network):
+    indptr = network["indptr"]
+    receivers = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(network["indices"], kind="stable")
+    transposed = np.zeros(len(indptr), dtype=np.int64)
+    np.cumsum(np.bincount(network["indices"], minlength=len(indptr) - 1), out=transposed[1:])
+    return {"indptr": transposed, "indices": receivers[order], "weights": network["weights"][order]}
+
+
+# CurrentlyInUse
+# The given rows (sorted node indices) of a network, as a smaller network that csrMatVec can use with values for
+# just the nodes in "columns": its indices point into columns, which are the nodes those rows have edges from
+def csrRows(network, rows):
+    indptr = network["indptr"]
+    starts = indptr[rows]
+    lengths = indptr[np.asarray(rows) + 1] - starts
+    offsets = np.cumsum(lengths) - lengths
+    edges = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    columns, indices = np.unique(network["indices"][edges], return_inverse=True)
+    subIndptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=subIndptr[1:])
+    return {"indptr": subIndptr, "indices": indices.reshape(-1), "weights": network["weights"][edges], "columns": columns}
+
+
 # CurrentlyInUse
 # To bring this in line with the within-node infection updates (and fix a few bugs), I'm going to rework
 # it so that we calculate an *expected number* of infectious contacts more directly. Then we'll distribute and
 # overlap them using the same infrastructure code that we'll use for the internal version, when we add that
 # Reminder: I expect the weighted edges to be the number of *expected infectious* contacts (if the giver is infectious)
 #  We may need to multiply movement numbers by a probability of infection to achieve this.   
-def doBetweenInfectionAgeStructured(graph, dictOfStates, currentTime, genericInfectionProb):
+# network is the graph compiled by compileNetwork. Pass it in when calling this repeatedly - if it's missing, the graph
+# is compiled on every call. Likewise nodeSummaries (from getNodeSummaries) is worked out here if not given.
+def doBetweenInfectionAgeStructured(graph, dictOfStates, currentTime, genericInfectionProb, network=None, nodeSummaries=None, profile=None):
+    if network is None:
+        network = compileNetwork(graph, list(dictOfStates[currentTime]))
+    if nodeSummaries is None:
+        nodeSummaries = getNodeSummaries({}, dictOfStates, currentTime)
+    fractionInfected = []
+    for givingVertex in network["nodes"]:
+        totalInfectedGiving = nodeSummaries[givingVertex]["infected"]
+        if totalInfectedGiving > 0:
+            fractionInfected.append(totalInfectedGiving/nodeSummaries[givingVertex]["total"])
+        else:
+            fractionInfected.append(0.0)
+    # expected infectious contacts into each node: sum over givers of weight*fractionGivingInfected
+    incomingContacts = csrMatVec(network, fractionInfected)
+
     totalIncomingInfectionsByNode = {}
-    for receivingVertex in dictOfStates[currentTime]:
-        totalSusceptHere = getTotalSuscept(dictOfStates[currentTime][receivingVertex])
+    for receivingVertex, contacts in zip(network["nodes"], incomingContacts):
+        totalSusceptHere = nodeSummaries[receivingVertex]["suscept"]
         totalIncomingInfectionsByNode[receivingVertex] = 0
         if totalSusceptHere >0:
-            neighbours = list(graph.predecessors(receivingVertex))
-            for givingVertex in neighbours:
-                    if givingVertex == receivingVertex:
-                        continue
-                    totalInfectedGiving = getTotalInfected(dictOfStates[currentTime][givingVertex])
-                    if totalInfectedGiving >0:
-                        weight = 1.0
-                        if 'weight' not in graph[givingVertex][receivingVertex]:
-                            print("ERROR: No weight available for edge " + str(givingVertex) + "," + str(receivingVertex) + " assigning weight 1.0")
-                        else:
-                            weight = graph[givingVertex][receivingVertex]['weight']
-                        
-                        fractionGivingInfected = totalInfectedGiving/totalIndividuals(dictOfStates[currentTime][givingVertex])
-                        fractionReceivingSus = totalSusceptHere/totalIndividuals(dictOfStates[currentTime][receivingVertex])
-                        totalIncomingInfectionsByNode[receivingVertex] = totalIncomingInfectionsByNode[receivingVertex] + weight*fractionGivingInfected*fractionReceivingSus
-
-                        
+            fractionReceivingSus = totalSusceptHere/nodeSummaries[receivingVertex]["total"]
+            totalIncomingInfectionsByNode[receivingVertex] = float(contacts)*fractionReceivingSus
+
 #   This might over-infect - we will need to adapt for multiple infections on a single individual if we have high infection threat.  TODO raise an issue                      
     for vertex in totalIncomingInfectionsByNode:
         totalDelta = totalIncomingInfectionsByNode[vertex]
@@ -216,6 +417,9 @@ def doBetweenInfectionAgeStructured(graph, dictOfStates, currentTime, genericInf
         for age in deltaByAge:
            dictOfStates[currentTime+1][vertex][(age, 'S')] = dictOfStates[currentTime+1][vertex][(age, 'S')] - deltaByAge[age]
            dictOfStates[currentTime+1][vertex][(age, 'E')] = dictOfStates[currentTime+1][vertex][(age, 'E')] + deltaByAge[age]
+    # distributeInfections allocates two dicts per node
+    profiling.addCounts(profile, nodesVisited=len(network["nodes"]), edgesEvaluated=len(network["indices"]),
+                        dictAllocations=2*len(totalIncomingInfectionsByNode) + 1)
 
 
 
@@ -226,7 +430,8 @@ def doBetweenInfectionAgeStructured(graph, dictOfStates, currentTime, genericInf
 #  that is, if a usual POLYMOD entry tells us that each individual of age1 is expected to have 1.2 contacts in category age2,
 #  and the probability of each of these being infectious is 0.25, then I would expect the matrix going into this
 # function as  ageMixingInfectionMatrix to have 0.3 in the entry [age1][age2]
-def doInternalInfectionProcess(currentInternalStateDict, ageMixingInfectionMatrix, ages, time):
+# totalsByAge is optional, from summariseNode(currentInternalStateDict)["byAge"] if you already have it
+def doInternalInfectionProcess(currentInternalStateDict, ageMixingInfectionMatrix, ages, time, totalsByAge=None):
     newInfectedsByAge = {}
     for age in ages:
         newInfectedsByAge[age] = 0
@@ -241,7 +446,10 @@ def doInternalInfectionProcess(currentInternalStateDict, ageMixingInfectionMatri
                 totalNewInfectionContacts = totalNewInfectionContacts + numInfectiousContactsFromAges[ageInf]
 #      Now, given that we expect totalNewInfectionContacts infectious contacts into our age category, how much overlap do we expect?
 #       and how many are with susceptible individuals? 
-            totalInAge = getTotalInAge(currentInternalStateDict, age)
+            if totalsByAge is None:
+                totalInAge = getTotalInAge(currentInternalStateDict, age)
+            else:
+                totalInAge = totalsByAge[age]
 #       Now when we draw totalNewInfectionContacts from totalInAge with replacement, how many do we expect?
 #       For now, a simplifying assumption that there are *many more* individuals in totalInAge than there are   totalNewInfectionContacts
 #       So we don't have to deal with multiple infections for the same individual.  TODO - address in future code update, raise issue for this
@@ -251,13 +459,20 @@ def doInternalInfectionProcess(currentInternalStateDict, ageMixingInfectionMatri
 
 
 # CurrentlyInUse        
-def doInteralInfectionProcessAllNodes(dictOfStates, ageMixingInfectionMatrix, ages, time):
+# nodeSummaries (from getNodeSummaries) is optional, and worked out here if not given
+def doInteralInfectionProcessAllNodes(dictOfStates, ageMixingInfectionMatrix, ages, time, nodeSummaries=None, profile=None):
     nextTime = time+1
+    if nodeSummaries is None:
+        nodeSummaries = getNodeSummaries({}, dictOfStates, time)
     for node in dictOfStates[time]:
-            newInfected = doInternalInfectionProcess(dictOfStates[time][node], ageMixingInfectionMatrix, ages, time)
+            newInfected = doInternalInfectionProcess(dictOfStates[time][node], ageMixingInfectionMatrix, ages, time, nodeSummaries[node]["byAge"])
             for age in newInfected:
                 dictOfStates[nextTime][node][(age, 'E')] = dictOfStates[nextTime][node][(age, 'E')] + newInfected[age]
                 dictOfStates[nextTime][node][(age, 'S')] = dictOfStates[nextTime][node][(age, 'S')] - newInfected[age]
+    if profile is not None:
+        # one dict for each node, plus one for each age group with susceptibles in it
+        withSuscept = sum(1 for node in dictOfStates[time] for age in ages if dictOfStates[time][node][(age, 'S')] > 0)
+        profiling.addCounts(profile, nodesVisited=len(dictOfStates[time]), dictAllocations=len(dictOfStates[time]) + withSuscept)
 
 
 # CurrentlyInUse
@@ -283,7 +498,7 @@ def internalStateDiseaseUpdate(currentInternalStateDict, diseaseProgressionProbs
 
 
 # CurrentlyInUse
-def doInternalProgressionAllNodes(dictOfNodeInternalStates, currentTime, diseaseProgressionProbs):
+def doInternalProgressionAllNodes(dictOfNodeInternalStates, currentTime, diseaseProgressionProbs, profile=None):
     nextTime = currentTime +1
     currStates = dictOfNodeInternalStates[currentTime]
     if nextTime not in dictOfNodeInternalStates:
@@ -291,6 +506,7 @@ def doInternalProgressionAllNodes(dictOfNodeInternalStates, currentTime, disease
     for vertex in currStates:
         nextProgressionState = internalStateDiseaseUpdate(currStates[vertex], diseaseProgressionProbs)
         dictOfNodeInternalStates[nextTime][vertex] = nextProgressionState
+    profiling.addCounts(profile, nodesVisited=len(currStates), dictAllocations=len(currStates))
         
 
 # CurrentlyInUse
@@ -0,0 +1,155 @@
+import numpy as np
+
+from . import population_engine
+
+# Dormand-Prince 5(4) coefficients: nodes, stage weights, 5th order weights and the difference between the 5th and
+# the embedded 4th order weights (for the error estimate)
+_C = np.array([0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0])
+_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+_B = np.array([35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84, 0.0])
+_E = np.array([71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+# Continuous extension of the same stages (Shampine), as coefficients of theta, theta^2, theta^3 and theta^4
+_P = np.array([
+    [1.0, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0.0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0.0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0.0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0.0, 40617522/29380423, -110615467/29380423, 69997945/29380423],
+])
+
+
+# CurrentlyInUse
+# Continuous-time counterpart of population_engine: the same compartments, by age and node, as a system of ODEs.
+# The per-day transition probabilities in model["transitions"] become rates with the same chance of still being in
+# a compartment after a day (staying with probability p means leaving at rate -ln(p)), split between the
+# destinations in proportion to their probabilities. rates[a, i, j] is the rate from compartments[i] to
+# compartments[j] for ages[a], with rates[a, i, i] minus the total rate out.
+# A compartment nobody stays in for a day can't be matched exactly, so it is treated as being left at rate
+# -ln(minStay).
+def progressionRates(model, minStay=1e-9):
+    transitions = model["transitions"]
+    stay = np.diagonal(transitions, axis1=-2, axis2=-1)
+    leaving = -np.log(np.maximum(stay, minStay))
+    rates = transitions * population_engine._safeDivide(leaving, 1.0 - stay)[..., np.newaxis]
+    diagonal = np.arange(transitions.shape[-1])
+    rates[..., diagonal, diagonal] = -leaving
+    return rates
+
+
+# CurrentlyInUse
+# Time derivative of states (indexed [<leading axes>, node, age, compartment]): progression at the rates above, and
+# infection (from S to E) at the daily rates population_engine works out from the same mixing matrix and network.
+def rightHandSide(model, rates, states):
+    compartments = model["compartments"]
+    derivative = np.einsum("...nac,...acd->...nad", states, rates)
+    infection = population_engine.doInternalInfection(model, states)
+    infection += population_engine.doBetweenInfection(model, states, cap=False)
+    infection = population_engine.applyNodeMultipliers(model, infection)
+    derivative[..., compartments.index('S')] -= infection
+    derivative[..., compartments.index('E')] += infection
+    return derivative
+
+
+def _rms(values):
+    return np.sqrt(np.mean(np.square(values)))
+
+
+# CurrentlyInUse
+# Integrates dy/dt = fun(t, y) from y(times[0]) = y0 with the adaptive Dormand-Prince 5(4) method, and returns y at
+# each of times (which must be increasing) as an array indexed [time, <shape of y0>].
+# Each step is accepted if its estimated error is below atol + rtol * |y| (in root mean square over all entries)
+# and the step size adapts to keep it there, so quiet stretches are crossed in a few long steps. Values at the
+# times asked for come from the method's continuous extension, so they don't force shorter steps.
+# stats, if given, is a dict that gets the number of accepted and rejected steps and of calls to fun.
+# Raises ValueError if the steps have to get too small to keep the error down, e.g. when fun gives NaN.
+def dormandPrince(fun, y0, times, rtol=1e-6, atol=1e-6, maxStep=np.inf, stats=None):
+    times = np.asarray(times, dtype=float)
+    if np.any(np.diff(times) < 0):
+        raise ValueError("The times to report at must be increasing")
+    output = np.empty((len(times),) + np.shape(y0))
+    t = times[0]
+    y = np.array(y0, dtype=float)
+    f = fun(t, y)
+    evaluations = 1
+    accepted = 0
+    rejected = 0
+    nextOutput = 0
+    while nextOutput < len(times) and times[nextOutput] == t:
+        output[nextOutput] = y
+        nextOutput += 1
+    if nextOutput == len(times):
+        if stats is not None:
+            stats.update(steps=0, rejected=0, evaluations=evaluations)
+        return output
+
+    # initial step size as suggested by Hairer, Norsett & Wanner
+    scale = atol + rtol*np.abs(y)
+    d0 = _rms(y/scale)
+    d1 = _rms(f/scale)
+    h = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01*d0/d1
+    h = min(h, maxStep, times[-1] - t)
+    f1 = fun(t + h, y + h*f)
+    evaluations += 1
+    d2 = _rms((f1 - f)/scale)/h
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h*1e-3)
+    else:
+        h1 = (0.01/max(d1, d2))**(1/5)
+    h = min(100*h, h1, maxStep, times[-1] - t)
+
+    stages = np.empty((7,) + y.shape)
+    while nextOutput < len(times):
+        h = min(h, times[-1] - t)
+        stages[0] = f
+        for i in range(1, 7):
+            increment = np.tensordot(_A[i], stages[:i], axes=1)
+            stages[i] = fun(t + _C[i]*h, y + h*increment)
+        evaluations += 6
+        yNew = y + h*np.tensordot(_B, stages, axes=1)
+        scale = atol + rtol*np.maximum(np.abs(y), np.abs(yNew))
+        error = _rms(h*np.tensordot(_E, stages, axes=1)/scale)
+
+        # a NaN or infinite error (from fun giving NaN or overflowing) is a failed step too, or it would spread into y
+        if not np.isfinite(error) or error > 1.0:
+            rejected += 1
+            h *= max(0.2, 0.9*error**(-1/5)) if np.isfinite(error) else 0.2
+            if not h > 16*np.spacing(t):
+                raise ValueError(f"Step size too small at t = {t}, the derivative is not finite or changes too fast")
+            continue
+
+        accepted += 1
+        tNew = t + h
+        while nextOutput < len(times) and times[nextOutput] <= tNew:
+            theta = (times[nextOutput] - t)/h
+            powers = theta**np.arange(1, 5)
+            output[nextOutput] = y + h*np.tensordot(_P @ powers, stages, axes=1)
+            nextOutput += 1
+        t = tNew
+        y = yNew
+        # the last stage is the derivative at the new point
+        f = stages[6].copy()
+        h = min(h*min(10.0, 0.9*error**(-1/5) if error > 0 else 10.0), maxStep)
+    if stats is not None:
+        stats.update(steps=accepted, rejected=rejected, evaluations=evaluations)
+    return output
+
+
+# CurrentlyInUse
+# ODE counterpart of population_engine.runSimulation: returns the number infectious (A+I) at each of times, indexed
+# [time, <leading axes>], and the states at those times, indexed [time, <leading axes>, node, age, compartment].
+def runODESimulation(model, initialStates, times, rtol=1e-6, atol=1e-6, maxStep=np.inf, stats=None):
+    rates = progressionRates(model)
+    history = dormandPrince(
+        lambda t, states: rightHandSide(model, rates, states), initialStates, times, rtol, atol, maxStep, stats
+    )
+    return population_engine.countInfections(model, history), history
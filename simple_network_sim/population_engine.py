@@ -0,0 +1,513 @@
+import numpy as np
+
+from . import network_of_populations, schedules
+
+
+# CurrentlyInUse
+# Dense-array counterpart of network_of_populations.basicSimulationInternalAgeStructure.
+# The population is held as a float array indexed [node, age, compartment], so each phase of a timestep is a
+# handful of array operations over all nodes at once instead of a walk over nested dicts. The orderings of the
+# three axes are kept in the model dict returned by compileModel, which is also what maps back to dicts.
+# All the step functions accept extra leading axes on the states (e.g. [trial, node, age, compartment]) and
+# carry them through, which is how ensembles are run in a single pass. The model's transitions and mixing can have
+# leading axes as well, broadcasting against the states' ones, which is how sweep runs many parameter sets at once.
+def getAgesAndCompartments(nodeStates):
+    ages = []
+    compartments = []
+    firstNode = next(iter(nodeStates.values()))
+    for (age, state) in firstNode:
+        if age not in ages:
+            ages.append(age)
+        if state not in compartments:
+            compartments.append(state)
+    return ages, compartments
+
+
+# CurrentlyInUse
+# nodeStates is a single time slice of dictOfStates, i.e. node -> {(age, state): number}
+def statesToArray(model, nodeStates):
+    states = np.zeros((len(model["nodes"]), len(model["ages"]), len(model["compartments"])))
+    for n, node in enumerate(model["nodes"]):
+        for a, age in enumerate(model["ages"]):
+            for c, state in enumerate(model["compartments"]):
+                states[n, a, c] = nodeStates[node][(age, state)]
+    return states
+
+
+# CurrentlyInUse
+def arrayToStates(model, states):
+    nodeStates = {}
+    for n, node in enumerate(model["nodes"]):
+        nodeStates[node] = {}
+        for c, state in enumerate(model["compartments"]):
+            for a, age in enumerate(model["ages"]):
+                nodeStates[node][(age, state)] = float(states[n, a, c])
+    return nodeStates
+
+
+# CurrentlyInUse
+# Everything that stays fixed during a run is translated into index/array form once, here.
+#  - transitions: per-age transition matrices, see network_of_populations.setUpTransitionMatrices
+#  - mixing: mixing[i, j] is ageInfectionMatrix[infectious age][susceptible age]
+#  - network: the movement graph in CSR form, see network_of_populations.compileNetwork
+#  - outgoing: the same graph with a row per giving node (network_of_populations.csrTranspose)
+# A network that has already been compiled (e.g. from loaders.readEdgeListArrays and
+# network_of_populations.compileNetworkFromArrays) can be passed in instead of the graph.
+# A model can also have nodeMultipliers, scaling all the new infections in each node (see schedules).
+def compileModel(graph, ageInfectionMatrix, diseaseProgressionProbs, nodeStates, network=None):
+    ages, compartments = getAgesAndCompartments(nodeStates)
+    if network is None:
+        network = network_of_populations.compileNetwork(graph)
+    nodes = network["nodes"]
+
+    mixing = np.array([[ageInfectionMatrix[ageInf][age] for age in ages] for ageInf in ages], dtype=float)
+
+    return {
+        "nodes": nodes,
+        "ages": ages,
+        "compartments": compartments,
+        "transitions": network_of_populations.setUpTransitionMatrices(diseaseProgressionProbs, ages, compartments),
+        "mixing": mixing,
+        "network": network,
+        "outgoing": network_of_populations.csrTranspose(network),
+    }
+
+
+def _safeDivide(numerator, denominator):
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    result = np.zeros(numerator.shape)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+
+# CurrentlyInUse
+# Array version of doInternalProgressionAllNodes: returns the progressed states, leaves the input untouched.
+# If out is given the result is written there (it must not be states itself).
+def doProgression(model, states, out=None):
+    return np.einsum("...nac,...acd->...nad", states, model["transitions"], out=out)
+
+
+# CurrentlyInUse
+# Array version of doInternalInfectionProcess, for every node at once. Returns new infections by [node, age].
+def doInternalInfection(model, states):
+    compartments = model["compartments"]
+    susceptible = states[..., compartments.index('S')]
+    infectious = states[..., compartments.index('A')] + states[..., compartments.index('I')]
+    contacts = infectious @ model["mixing"]
+    return contacts * _safeDivide(susceptible, states.sum(axis=-1))
+
+
+# CurrentlyInUse
+# Array version of doBetweenInfectionAgeStructured. Returns new infections by [node, age].
+# If nodes (sorted node indices) are given, only the new infections in those nodes are worked out, indexed
+# [<leading axes>, position in nodes, age], and only the edges into them are looked at.
+# With cap=False the result is a rate (per day) rather than a number of people, so it isn't limited to the number
+# of susceptibles.
+def doBetweenInfection(model, states, nodes=None, cap=True):
+    compartments = model["compartments"]
+    network = model["network"]
+    givers = states
+    if nodes is not None:
+        network = network_of_populations.csrRows(network, nodes)
+        givers = states[..., network["columns"], :, :]
+        states = states[..., nodes, :, :]
+    totals = states.sum(axis=(-2, -1))
+    susceptibleByAge = states[..., compartments.index('S')]
+    susceptible = susceptibleByAge.sum(axis=-1)
+    if nodes is None:
+        infected = (states[..., compartments.index('A')] + states[..., compartments.index('I')]).sum(axis=-1)
+        fractionInfected = _safeDivide(infected, totals)
+    else:
+        infected = (givers[..., compartments.index('A')] + givers[..., compartments.index('I')]).sum(axis=-1)
+        fractionInfected = _safeDivide(infected, givers.sum(axis=(-2, -1)))
+
+    # the node axis goes first for the sparse product, so that any leading axes are carried along
+    pressure = network_of_populations.csrMatVec(network, np.moveaxis(fractionInfected, -1, 0))
+    incoming = np.moveaxis(pressure, 0, -1) * _safeDivide(susceptible, totals)
+
+    if cap and np.any(incoming > susceptible):
+        print('ERROR: Too many infections to distribute amongst age classes - adjusting num infections')
+        incoming = np.minimum(incoming, susceptible)
+    # as in distributeInfections, spread uniformly across ages by number of susceptibles
+    return susceptibleByAge * _safeDivide(incoming, susceptible)[..., np.newaxis]
+
+
+# CurrentlyInUse
+# New infections by [<leading axes>, node, age] scaled by the model's nodeMultipliers, if it has any (nodes is as
+# for doBetweenInfection)
+def applyNodeMultipliers(model, newInfected, nodes=None):
+    multipliers = model.get("nodeMultipliers")
+    if multipliers is None:
+        return newInfected
+    if nodes is not None:
+        multipliers = multipliers[nodes]
+    return newInfected * multipliers[:, np.newaxis]
+
+
+# CurrentlyInUse
+def countInfections(model, states):
+    compartments = model["compartments"]
+    return (states[..., compartments.index('A')] + states[..., compartments.index('I')]).sum(axis=(-2, -1))
+
+
+# Which compartments each running counter adds up (None meaning all of them)
+COUNTERS = {
+    "susceptible": ['S'],
+    "infectious": ['A', 'I'],
+    "hospitalised": ['H'],
+    "deaths": ['D'],
+    "active": network_of_populations.ACTIVE_STATES,
+    "population": None,
+}
+
+
+# CurrentlyInUse
+# Running totals for each of COUNTERS, per node and overall, kept up to date by doTimestep from the flows it applies
+# (rather than by adding up the states again), so reading them with getCounter/getNodeCounter costs nothing.
+# This scans states once, to get the starting values.
+def setUpCounters(model, states):
+    compartments = model["compartments"]
+    names = list(COUNTERS)
+    membership = np.zeros((len(names), len(compartments)))
+    for g, name in enumerate(names):
+        for state in COUNTERS[name] or compartments:
+            membership[g, compartments.index(state)] = 1.0
+    nodeCounts = np.einsum("...nac,gc->...ng", states, membership)
+    return {
+        "names": names,
+        # net change in each counter for every person in [age, compartment] that goes through progression
+        "progression": np.einsum("...acd,gd->...gac", model["transitions"], membership) - membership[:, np.newaxis, :],
+        # net change in each counter for every new infection (a move from S to E)
+        "infection": membership[:, compartments.index('E')] - membership[:, compartments.index('S')],
+        "membership": membership,
+        "nodes": nodeCounts,
+        "total": nodeCounts.sum(axis=-2),
+    }
+
+
+# CurrentlyInUse
+# If nodes are given, states and newInfected are for just those nodes (as in doTimestep)
+def updateCounters(counters, states, newInfected, nodes=None):
+    nodeDeltas = np.einsum("...nac,...gac->...ng", states, counters["progression"])
+    nodeDeltas += newInfected.sum(axis=-1)[..., np.newaxis] * counters["infection"]
+    _addCounterDeltas(counters, nodeDeltas, nodes)
+
+
+def _addCounterDeltas(counters, nodeDeltas, nodes=None):
+    if nodes is None:
+        counters["nodes"] += nodeDeltas
+    else:
+        counters["nodes"][..., nodes, :] += nodeDeltas
+    counters["total"] += nodeDeltas.sum(axis=-2)
+
+
+# CurrentlyInUse
+# Overall value of one of the COUNTERS, e.g. getCounter(counters, "infectious")
+def getCounter(counters, name):
+    return counters["total"][..., counters["names"].index(name)]
+
+
+# CurrentlyInUse
+# Per-node values of one of the COUNTERS, indexed [<leading axes>, node]
+def getNodeCounter(counters, name):
+    return counters["nodes"][..., counters["names"].index(name)]
+
+
+# CurrentlyInUse
+# One timestep: both infection processes act on the current states, and are applied on top of the progression.
+# Counters (from setUpCounters) are moved on to match the new states, if given.
+# With nodes (sorted node indices, e.g. from findActiveNodes) only those nodes are stepped: they are written into
+# out, and the rest of out is left as it is (or is a copy of states, if out is not given).
+def doTimestep(model, states, out=None, counters=None, nodes=None):
+    compartments = model["compartments"]
+    current = states if nodes is None else states[..., nodes, :, :]
+    newInfected = doInternalInfection(model, current) + doBetweenInfection(model, states, nodes)
+    newInfected = applyNodeMultipliers(model, newInfected, nodes)
+    if counters is not None:
+        updateCounters(counters, current, newInfected, nodes)
+    nextStates = doProgression(model, current, out=out if nodes is None else None)
+    nextStates[..., compartments.index('S')] -= newInfected
+    nextStates[..., compartments.index('E')] += newInfected
+    return _writeNodes(states, nextStates, out, nodes)
+
+
+def _writeNodes(states, nextStates, out, nodes):
+    if nodes is None:
+        if out is None:
+            return nextStates
+        if out is not nextStates:
+            out[...] = nextStates
+        return out
+    if out is None:
+        out = states.copy()
+    out[..., nodes, :, :] = nextStates
+    return out
+
+
+# CurrentlyInUse
+# The nodes (sorted indices) where anything can change in the next timestep: those with anybody in a compartment
+# that people move out of, those with anybody infectious (even if they don't move on, e.g. with a_escape at 0, they
+# still infect the node itself) and those that can be infected by them over the network. Any other node only has
+# people in compartments like S, R and D, and nobody infectious nearby, so stays as it is.
+# With leading axes, a node counts if it is active in any of them.
+# If there turn out to be more than limit active nodes, None is returned instead, without finding them all.
+def findActiveNodes(model, states, limit=None):
+    compartments = model["compartments"]
+    transitions = model["transitions"]
+    moving = [c for c in range(len(compartments)) if np.any(transitions[..., c, c] != 1.0)]
+    infectious = [compartments.index('A'), compartments.index('I')]
+    numNodes = states.shape[-3]
+    busy = np.any(states[..., moving] != 0, axis=(-2, -1)).reshape((-1, numNodes)).any(axis=0)
+    if limit is not None and np.count_nonzero(busy) > limit:
+        return None
+    infecting = np.any(states[..., infectious] != 0, axis=(-2, -1)).reshape((-1, numNodes)).any(axis=0)
+    receivers = network_of_populations.csrRows(model["outgoing"], np.flatnonzero(infecting))["columns"]
+    nodes = np.union1d(np.flatnonzero(busy | infecting), receivers)
+    if limit is not None and len(nodes) > limit:
+        return None
+    return nodes
+
+
+# Binomial draws only where there is anybody to draw from (and any chance of drawing them), as most compartments
+# are empty for most of a run
+def _sampleBinomial(generator, counts, probs):
+    drawn = np.zeros(counts.shape, dtype=np.int64)
+    probs = np.broadcast_to(probs, counts.shape)
+    occupied = (counts > 0) & (probs > 0)
+    if occupied.any():
+        drawn[occupied] = generator.binomial(counts[occupied], probs[occupied])
+    return drawn
+
+
+# CurrentlyInUse
+# Stochastic version of doProgression, for states holding whole numbers of people: everybody in each node, age and
+# compartment moves according to a multinomial draw over the transition probabilities, made as a chain of binomial
+# draws (one per possible destination, each conditional on not having gone to the earlier ones) for all nodes, ages
+# and leading axes at once. Destinations that no age can reach are skipped, and so are compartments nobody leaves.
+# If counters are given they are moved on by the flows drawn (the caller takes care of the infections).
+# nodes is as for doTimestep.
+def sampleProgression(model, states, generator, out=None, counters=None, nodes=None):
+    transitions = model["transitions"]
+    current = states if nodes is None else states[..., nodes, :, :]
+    # compartment first, so that each compartment is a contiguous block
+    population = np.ascontiguousarray(np.moveaxis(np.rint(current), -1, 0), dtype=np.int64)
+    arrived = np.zeros(population.shape, dtype=np.int64)
+    for c in range(transitions.shape[-2]):
+        destinations = [d for d in range(transitions.shape[-1]) if np.any(transitions[..., c, d] > 0)]
+        # probabilities by [<leading axes>, 1, age, destination], so that they broadcast over the nodes
+        probs = transitions[..., np.newaxis, :, c, destinations]
+        remainingProbs = np.cumsum(probs[..., ::-1], axis=-1)[..., ::-1]
+        conditional = np.clip(_safeDivide(probs, remainingProbs), 0.0, 1.0)
+        remaining = population[c]
+        for k, d in enumerate(destinations):
+            if k == len(destinations) - 1:
+                moved = remaining
+            else:
+                moved = _sampleBinomial(generator, remaining, conditional[..., k])
+                remaining = remaining - moved
+            arrived[d] += moved
+    if counters is not None:
+        netArrivals = np.array([(arrived[c] - population[c]).sum(axis=-1) for c in range(len(population))])
+        _addCounterDeltas(counters, np.moveaxis(np.tensordot(counters["membership"], netArrivals, axes=1), 0, -1), nodes)
+    if out is None and nodes is None:
+        out = np.empty(states.shape)
+    return _writeNodes(states, np.moveaxis(arrived, 0, -1), out, nodes)
+
+
+# CurrentlyInUse
+# Stochastic infections: the expected numbers from both infection processes, exactly as doTimestep works them out,
+# become the success probabilities of a binomial draw over the susceptibles of each node and age.
+# nodes is as for doBetweenInfection.
+def sampleInfections(model, states, generator, nodes=None):
+    current = states if nodes is None else states[..., nodes, :, :]
+    susceptible = np.rint(current[..., model["compartments"].index('S')]).astype(np.int64)
+    expected = applyNodeMultipliers(model, doInternalInfection(model, current) + doBetweenInfection(model, states, nodes), nodes)
+    probs = np.minimum(_safeDivide(expected, susceptible), 1.0)
+    return _sampleBinomial(generator, susceptible, probs).astype(float)
+
+
+# CurrentlyInUse
+# Stochastic version of doTimestep (a tau-leap with a step of one day), with generator a numpy.random.Generator,
+# e.g. numpy.random.default_rng(seed). nodes is as for doTimestep.
+def doStochasticTimestep(model, states, generator, out=None, counters=None, nodes=None):
+    compartments = model["compartments"]
+    newInfected = sampleInfections(model, states, generator, nodes)
+    nextStates = sampleProgression(model, states, generator, out=out, counters=counters, nodes=nodes)
+    if counters is not None:
+        _addCounterDeltas(counters, newInfected.sum(axis=-1)[..., np.newaxis] * counters["infection"], nodes)
+    # the newly infected are still counted as susceptible by sampleProgression, and S only ever goes to S
+    changed = nextStates if nodes is None else nextStates[..., nodes, :, :]
+    changed[..., compartments.index('S')] -= newInfected
+    changed[..., compartments.index('E')] += newInfected
+    return _writeNodes(states, changed, nextStates, nodes)
+
+
+# CurrentlyInUse
+# Returns the A+I time series (same meaning as network_of_populations.basicSimulationInternalAgeStructure) as an
+# array indexed [time, <leading axes>], and the history of states indexed [time, <leading axes>, node, age,
+# compartment].
+# Only two state arrays are needed to step (the current and the next, swapped each step), so how much history is
+# kept is up to the caller:
+#  - keepHistory=True keeps every time from 0 to timeHorizon
+#  - keepHistory=False keeps nothing and None is returned in place of the history
+#  - keepHistory=[t1, t2, ...] keeps only those times, history[i] being the states at time keepHistory[i]; they have
+#    to be increasing and within the run (from startTime to timeHorizon)
+# Each observer is called as observer(time, states) for every time from 0 to timeHorizon. The states array is reused
+# for later steps, so observers have to copy anything they want to hold on to.
+# Pass counters from setUpCounters(model, initialStates) to follow them during the run (e.g. from an observer).
+# With a numpy.random.Generator as generator the run is stochastic (see doStochasticTimestep) rather than
+# deterministic, and initialStates should hold whole numbers of people.
+# With a stopThreshold, each trial (i.e. each entry along the leading axes) is frozen once no more than that many of
+# its people are in E, A, I or H, 0 meaning once it has died out. Frozen trials are no longer stepped, and once they
+# all are the run stops, padding the time series and any history with the final states (observers still see every
+# time).
+# With an activeFraction (e.g. 0.5), each step only touches the nodes findActiveNodes picks out, for as long as they
+# are no more than that fraction of all the nodes, which is much quicker while an outbreak is still local. The
+# results are the same as stepping every node.
+# With a startTime, initialStates are the states at that time (e.g. from checkpoint.loadCheckpoint) and the run goes
+# on from there: the time series then starts at startTime, while observers and keepHistory still use actual times.
+# With a schedule from schedules.compileSchedule, each step from time to time + 1 uses the mixing, network and node
+# multipliers the schedule has for time instead of the model's.
+def runSimulation(model, initialStates, timeHorizon, keepHistory=True, observers=(), counters=None, generator=None, stopThreshold=None, activeFraction=None, startTime=0, schedule=None):
+    if schedule is not None and len(schedule["index"]) < timeHorizon:
+        raise ValueError(f"The schedule only goes up to time {len(schedule['index'])}, not {timeHorizon}")
+    if keepHistory is True:
+        keepTimes = range(startTime, timeHorizon + 1)
+    elif keepHistory is False:
+        keepTimes = []
+    else:
+        keepTimes = list(keepHistory)
+        if any(later <= earlier for earlier, later in zip(keepTimes, keepTimes[1:])):
+            raise ValueError(f"The times to keep have to be increasing, not {keepTimes}")
+        if keepTimes and (keepTimes[0] < startTime or keepTimes[-1] > timeHorizon):
+            raise ValueError(f"The times to keep have to be from {startTime} to {timeHorizon}, not {keepTimes}")
+    keepIndex = {time: i for i, time in enumerate(keepTimes)}
+    history = None
+    if keepHistory is not False:
+        history = np.empty((len(keepTimes),) + initialStates.shape)
+
+    timeSeriesInfection = np.empty((timeHorizon - startTime,) + initialStates.shape[:-3])
+    states = np.array(initialStates, dtype=float)
+    nextStates = np.empty_like(states)
+    if counters is None:
+        counters = setUpCounters(model, states)
+    frozen = np.zeros(states.shape[:-3], dtype=bool)
+    # nodes written into states by the last step (None meaning all of them)
+    written = None
+    for time in range(startTime, timeHorizon + 1):
+        if time in keepIndex:
+            history[keepIndex[time]] = states
+        for observer in observers:
+            observer(time, states)
+        if time == timeHorizon:
+            break
+        timeSeriesInfection[time - startTime] = getCounter(counters, "infectious")
+        if schedule is not None:
+            model = schedule["models"][schedule["index"][time]]
+
+        if stopThreshold is not None:
+            nowFrozen = getCounter(counters, "active") <= stopThreshold
+            if nowFrozen.all():
+                _padRun(states, time, timeHorizon, timeSeriesInfection[time - startTime:], history, keepIndex, observers)
+                break
+            # the frozen states have to be in both buffers, as they are not written again
+            nextStates[nowFrozen & ~frozen] = states[nowFrozen & ~frozen]
+            frozen = nowFrozen
+        nodes = None
+        if activeFraction is not None:
+            nodes = findActiveNodes(model, states, limit=activeFraction*states.shape[-3])
+        if nodes is not None:
+            # the nodes left alone this time have to be brought up to date in the other buffer
+            stale = np.setdiff1d(np.arange(states.shape[-3]) if written is None else written, nodes, assume_unique=True)
+            nextStates[..., stale, :, :] = states[..., stale, :, :]
+        written = nodes
+        if frozen.any():
+            _stepTrials(model, states, nextStates, counters, generator, np.nonzero(~frozen), nodes)
+        elif generator is None:
+            doTimestep(model, states, out=nextStates, counters=counters, nodes=nodes)
+        else:
+            doStochasticTimestep(model, states, generator, out=nextStates, counters=counters, nodes=nodes)
+        states, nextStates = nextStates, states
+    return timeSeriesInfection, history
+
+
+# Steps only the trials in index (a tuple of index arrays over the leading axes), with their counters and, if the
+# model has leading axes of its own (e.g. from sweep.sweepModel), with their own parameters
+def _stepTrials(model, states, nextStates, counters, generator, index, nodes=None):
+    leadingShape = states.shape[:-3]
+    model = dict(
+        model,
+        transitions=_trialParameters(model["transitions"], 3, leadingShape, index),
+        mixing=_trialParameters(model["mixing"], 2, leadingShape, index),
+    )
+    trialCounters = dict(
+        counters,
+        nodes=counters["nodes"][index],
+        total=counters["total"][index],
+        progression=_trialParameters(counters["progression"], 3, leadingShape, index),
+    )
+    if generator is None:
+        nextStates[index] = doTimestep(model, states[index], counters=trialCounters, nodes=nodes)
+    else:
+        nextStates[index] = doStochasticTimestep(model, states[index], generator, counters=trialCounters, nodes=nodes)
+    counters["nodes"][index] = trialCounters["nodes"]
+    counters["total"][index] = trialCounters["total"]
+
+
+# parameters with ndim axes of their own, plus any leading axes to broadcast against the states' ones
+def _trialParameters(parameters, ndim, leadingShape, index):
+    if parameters.ndim == ndim:
+        return parameters
+    return np.broadcast_to(parameters, leadingShape + parameters.shape[-ndim:])[index]
+
+
+# Everything from time on stays as states, once the run has stopped early (timeSeriesInfection is the part of the
+# time series from time on)
+def _padRun(states, time, timeHorizon, timeSeriesInfection, history, keepIndex, observers):
+    timeSeriesInfection[:] = timeSeriesInfection[0]
+    for laterTime in range(time + 1, timeHorizon + 1):
+        if laterTime in keepIndex:
+            history[keepIndex[laterTime]] = states
+        for observer in observers:
+            observer(laterTime, states)
+
+
+# CurrentlyInUse
+# Drop-in replacement for network_of_populations.basicSimulationInternalAgeStructure. It picks and seeds the
+# infected node the same way (including writing the seed into dictOfStates[0]), but the rest of the history is
+# kept as an array, so dictOfStates is not filled in for later times - use runSimulation if you need it.
+# A schedule (a list of periods, see schedules.compileSchedule) changes the mixing and the network over time.
+def basicSimulationInternalAgeStructure(rand, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates, stopThreshold=None, schedule=None):
+    # for now, we choose a random node and infect numInfected mature individuals - right now they are extra individuals, not removed from the susceptible class
+    infectedNode = rand.choices(list(graph.nodes()), k=1)
+    for vertex in infectedNode:
+        dictOfStates[0][vertex][('m', 'E')] = numInfected
+
+    model = compileModel(graph, ageInfectionMatrix, diseaseProgressionProbs, dictOfStates[0])
+    if schedule is not None:
+        schedule = schedules.compileSchedule(model, schedule, timeHorizon)
+    timeSeriesInfection, _ = runSimulation(model, statesToArray(model, dictOfStates[0]), timeHorizon, keepHistory=False, stopThreshold=stopThreshold, schedule=schedule)
+    return timeSeriesInfection.tolist()
+
+
+# CurrentlyInUse
+# Runs one trial per entry of rands, all advancing together as a [trial, node, age, compartment] array.
+# Each trial picks its seed node with its own random stream, the same way basicSimulationInternalAgeStructure does,
+# but every trial starts from nodeStates as given (nothing is written back into it).
+# Returns the A+I time series indexed [trial, time], so ensemble statistics are reductions over axis 0, e.g.
+# timeSeries.mean(axis=0) is what common.generateMeanPlot would give and np.quantile(timeSeries, q, axis=0)
+# gives quantiles.
+# Given a numpy.random.Generator, the trials are stochastic (see doStochasticTimestep), each one making its own draws.
+# stopThreshold is as for runSimulation, and schedule as for basicSimulationInternalAgeStructure.
+def basicSimulationEnsemble(rands, graph, numInfected, timeHorizon, genericInfection, ageInfectionMatrix, diseaseProgressionProbs, nodeStates, generator=None, stopThreshold=None, schedule=None):
+    model = compileModel(graph, ageInfectionMatrix, diseaseProgressionProbs, nodeStates)
+    initialStates = np.repeat(statesToArray(model, nodeStates)[np.newaxis], len(rands), axis=0)
+    nodeIndex = {node: n for n, node in enumerate(model["nodes"])}
+    for trial, rand in enumerate(rands):
+        for vertex in rand.choices(model["nodes"], k=1):
+            initialStates[trial, nodeIndex[vertex], model["ages"].index('m'), model["compartments"].index('E')] = numInfected
+
+    if schedule is not None:
+        schedule = schedules.compileSchedule(model, schedule, timeHorizon)
+    timeSeriesInfection, _ = runSimulation(model, initialStates, timeHorizon, keepHistory=False, generator=generator, stopThreshold=stopThreshold, schedule=schedule)
+    return timeSeriesInfection.T
@@ -0,0 +1,59 @@
+import time as timer
+
+
+# CurrentlyInUse
+# Profiles are plain dicts, filled in by the simulation loop when one is passed in, e.g.
+#
+#   profile = profiling.newProfile(trace=True)
+#   network_of_populations.basicSimulationInternalAgeStructure(..., profile=profile)
+#   print(profiling.formatSummary(profile))
+#
+# Each phase accumulates its wall-clock time, the number of times it ran and any work counts reported by the phase
+# itself (nodes visited, edges evaluated, dicts allocated, ...). With trace=True there is also one entry per phase
+# per timestep in profile["trace"].
+# All the functions here do nothing when given None instead of a profile, so the loop can call them unconditionally.
+def newProfile(trace=False):
+    return {"phases": {}, "pending": {}, "trace": [] if trace else None}
+
+
+# CurrentlyInUse
+def startPhase(profile):
+    if profile is None:
+        return None
+    return timer.perf_counter()
+
+
+# CurrentlyInUse
+# Work counts reported from inside a phase, attributed to it when it ends
+def addCounts(profile, **counts):
+    if profile is None:
+        return
+    for name, count in counts.items():
+        profile["pending"][name] = profile["pending"].get(name, 0) + count
+
+
+# CurrentlyInUse
+def endPhase(profile, phase, start, time):
+    if profile is None:
+        return
+    seconds = timer.perf_counter() - start
+    counts = profile["pending"]
+    profile["pending"] = {}
+    summary = profile["phases"].setdefault(phase, {"seconds": 0.0, "calls": 0, "counts": {}})
+    summary["seconds"] += seconds
+    summary["calls"] += 1
+    for name, count in counts.items():
+        summary["counts"][name] = summary["counts"].get(name, 0) + count
+    if profile["trace"] is not None:
+        profile["trace"].append({"time": time, "phase": phase, "seconds": seconds, "counts": counts})
+
+
+# CurrentlyInUse
+def formatSummary(profile):
+    totalSeconds = sum(summary["seconds"] for summary in profile["phases"].values())
+    lines = [f"{'phase':<20} {'calls':>8} {'seconds':>12} {'share':>7}  counts"]
+    for phase, summary in profile["phases"].items():
+        share = summary["seconds"]/totalSeconds if totalSeconds > 0 else 0.0
+        counts = ", ".join(f"{name}={count}" for name, count in summary["counts"].items())
+        lines.append(f"{phase:<20} {summary['calls']:>8} {summary['seconds']:>12.6f} {share:>7.1%}  {counts}")
+    return "\n".join(lines)
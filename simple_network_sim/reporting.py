@@ -0,0 +1,71 @@
+import csv
+
+import numpy as np
+
+from . import population_engine
+
+
+# CurrentlyInUse
+# Reporting on array histories, as returned by population_engine.runSimulation and indexed
+# [time, node, age, compartment]. Every aggregation is a single reduction over the history, and the writers go
+# through csv.writer in one pass, so the cost is linear in the size of the output.
+# historyFromDictOfStates converts the dict-based dictOfStates so that its output can be reported the same way.
+def historyFromDictOfStates(model, dictOfStates):
+    times = sorted(dictOfStates)
+    return np.array([population_engine.statesToArray(model, dictOfStates[time]) for time in times])
+
+
+# CurrentlyInUse
+# returns [time, node, compartment]
+def aggregateOverAges(history):
+    return history.sum(axis=-2)
+
+
+# CurrentlyInUse
+# returns [time, age, compartment]
+def aggregateOverNodes(history):
+    return history.sum(axis=-3)
+
+
+# CurrentlyInUse
+# Groups nodes by one of their attributes (e.g. health board), where nodeAttributes is like the dictionary returned
+# by loaders.readNodeAttributesJSON. Returns the list of group labels (in order of first appearance) and the
+# history summed within each group, indexed [time, group, age, compartment].
+def aggregateByAttribute(history, nodes, nodeAttributes, attribute):
+    groups = []
+    groupOfNode = []
+    missing = []
+    for node in nodes:
+        if node not in nodeAttributes or attribute not in nodeAttributes[node]:
+            missing.append(str(node))
+            continue
+        value = nodeAttributes[node][attribute]
+        if value not in groups:
+            groups.append(value)
+        groupOfNode.append(groups.index(value))
+    if missing:
+        raise ValueError(f"Nodes missing attribute \"{attribute}\": {', '.join(missing)}")
+    membership = np.zeros((len(groups), len(nodes)))
+    membership[groupOfNode, np.arange(len(nodes))] = 1.0
+    return groups, np.einsum("gn,...nac->...gac", membership, history)
+
+
+# CurrentlyInUse
+# Writes one row per label and compartment, with the values over time along the row, i.e. the same layout as
+# network_of_populations.basicReportingFunction but with a header line.
+# aggregated is indexed [time, label, compartment], e.g. the output of aggregateOverAges.
+def writeStateReport(fp, aggregated, labels, compartments, labelName="node"):
+    writer = csv.writer(fp, lineterminator="\n")
+    writer.writerow([labelName, "state"] + list(range(aggregated.shape[0])))
+    byLabel = np.moveaxis(aggregated, 0, -1)
+    writer.writerows(
+        [label, state] + byLabel[i, c].tolist()
+        for i, label in enumerate(labels)
+        for c, state in enumerate(compartments)
+    )
+
+
+# CurrentlyInUse
+# The report basicReportingFunction produces (numbers per node and state, summed over ages), written to fp
+def writeBasicReport(fp, model, history):
+    writeStateReport(fp, aggregateOverAges(history), model["nodes"], model["compartments"])
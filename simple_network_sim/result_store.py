@@ -0,0 +1,140 @@
+import json
+import os
+import re
+
+import numpy as np
+
+METADATA_FILE = "metadata.json"
+CHUNK_PATTERN = re.compile(r"chunk-\d{6}\.dat")
+
+
+# CurrentlyInUse
+# On-disk store for the full output of population_engine.runSimulation, i.e. states indexed
+# [time, <leading axes>, node, age, compartment], for runs too big to keep the history in memory.
+# The times are split into chunks of chunkSize timesteps, each chunk being a raw float64 file read and written with
+# numpy.memmap, and metadata.json next to them has the node labels, ages, compartments and shape. Only one chunk is
+# open for writing at a time, and reads only touch the chunks (and pages) covering what was asked for. e.g.
+#
+#   store = result_store.createStore("results", model, timeHorizon)
+#   population_engine.runSimulation(model, states, timeHorizon, keepHistory=False, observers=[result_store.observer(store)])
+#   result_store.closeStore(store)
+#   ...
+#   hospitalised = result_store.readStates(result_store.openStore("results"), compartments=['H'], times=(10, 20))
+def createStore(directory, model, timeHorizon, leadingShape=(), chunkSize=100):
+    if chunkSize < 1:
+        raise ValueError(f"chunkSize must be at least 1, got {chunkSize}")
+    os.makedirs(directory, exist_ok=True)
+    # chunks left from an earlier store in the same directory would otherwise be reopened by writeStates, with their
+    # old data and maybe another shape
+    for filename in os.listdir(directory):
+        if CHUNK_PATTERN.fullmatch(filename):
+            os.remove(os.path.join(directory, filename))
+    metadata = {
+        "nodes": list(model["nodes"]),
+        "ages": list(model["ages"]),
+        "compartments": list(model["compartments"]),
+        "numTimes": timeHorizon + 1,
+        "leadingShape": list(leadingShape),
+        "chunkSize": chunkSize,
+        "dtype": "float64",
+    }
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=1)
+    return {"directory": directory, "metadata": metadata, "chunk": None, "chunkIndex": None}
+
+
+# CurrentlyInUse
+def openStore(directory):
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    return {"directory": directory, "metadata": metadata, "chunk": None, "chunkIndex": None}
+
+
+def _chunkFilename(store, chunkIndex):
+    return os.path.join(store["directory"], f"chunk-{chunkIndex:06d}.dat")
+
+
+def _chunkShape(metadata, chunkIndex):
+    start = chunkIndex*metadata["chunkSize"]
+    numTimes = min(metadata["chunkSize"], metadata["numTimes"] - start)
+    stateShape = (len(metadata["nodes"]), len(metadata["ages"]), len(metadata["compartments"]))
+    return (numTimes,) + tuple(metadata["leadingShape"]) + stateShape
+
+
+# CurrentlyInUse
+# Writes the states for one time, which must have the shape the store was created with
+def writeStates(store, time, states):
+    metadata = store["metadata"]
+    if not 0 <= time < metadata["numTimes"]:
+        raise ValueError(f"Time {time} is outside the store (0 to {metadata['numTimes'] - 1})")
+    chunkIndex = time // metadata["chunkSize"]
+    if store["chunkIndex"] != chunkIndex:
+        _flushChunk(store)
+        shape = _chunkShape(metadata, chunkIndex)
+        filename = _chunkFilename(store, chunkIndex)
+        mode = "r+" if os.path.exists(filename) else "w+"
+        store["chunk"] = np.memmap(filename, dtype=metadata["dtype"], mode=mode, shape=shape)
+        store["chunkIndex"] = chunkIndex
+    store["chunk"][time - chunkIndex*metadata["chunkSize"]] = states
+
+
+def _flushChunk(store):
+    if store["chunk"] is not None:
+        store["chunk"].flush()
+        store["chunk"] = None
+        store["chunkIndex"] = None
+
+
+# CurrentlyInUse
+def closeStore(store):
+    _flushChunk(store)
+
+
+# CurrentlyInUse
+# An observer for population_engine.runSimulation that writes every timestep into the store
+def observer(store):
+    def observe(time, states):
+        writeStates(store, time, states)
+    return observe
+
+
+def _indices(labels, selected, kind):
+    if selected is None:
+        return list(range(len(labels)))
+    indices = []
+    for label in selected:
+        if label not in labels:
+            raise ValueError(f"Unknown {kind}: {label}")
+        indices.append(labels.index(label))
+    return indices
+
+
+# CurrentlyInUse
+# Reads part of the store back as an array indexed [time, <leading axes>, node, age, compartment], only loading the
+# chunks that overlap the times asked for.
+#  - times: (start, stop) like range, default all of them
+#  - nodes, ages, compartments: lists of labels, in the order wanted in the output, default all of them
+def readStates(store, times=None, nodes=None, ages=None, compartments=None):
+    metadata = store["metadata"]
+    start, stop = (0, metadata["numTimes"]) if times is None else times
+    if not 0 <= start <= stop <= metadata["numTimes"]:
+        raise ValueError(f"Times {start} to {stop} are outside the store (0 to {metadata['numTimes']})")
+    nodeIndices = _indices(metadata["nodes"], nodes, "node")
+    ageIndices = _indices(metadata["ages"], ages, "age")
+    compartmentIndices = _indices(metadata["compartments"], compartments, "compartment")
+
+    # times first and nodes next, as those are the slowest varying axes of the files
+    chunkSize = metadata["chunkSize"]
+    pieces = []
+    for chunkIndex in range(start // chunkSize, (stop - 1) // chunkSize + 1 if stop > start else 0):
+        chunk = np.memmap(_chunkFilename(store, chunkIndex), dtype=metadata["dtype"], mode="r", shape=_chunkShape(metadata, chunkIndex))
+        chunkStart = chunkIndex*chunkSize
+        block = chunk[max(start - chunkStart, 0):stop - chunkStart]
+        block = np.take(block, nodeIndices, axis=-3)
+        block = np.take(block, ageIndices, axis=-2)
+        pieces.append(np.take(block, compartmentIndices, axis=-1))
+        del chunk
+    if not pieces:
+        shape = (0,) + tuple(metadata["leadingShape"]) + (len(nodeIndices), len(ageIndices), len(compartmentIndices))
+        return np.empty(shape)
+    return np.concatenate(pieces)
@@ -4,8 +4,9 @@ import sys
 from collections import Counter
 import matplotlib.pyplot as plt
 import json
+import os
 
-from . import common, network_of_populations as ss, loaders
+from . import ensemble, network_of_populations as ss, loaders
 
     
  #  A bit of sample model operation.     
@@ -35,28 +36,34 @@ baseGraph = nx.path_graph(10)
 for (u, v) in list(baseGraph.edges()):
      baseGraph[u][v]['weight'] = baseWeight
 
-params = loaders.readParametersAgeStructured(sys.argv[1])
 
-ageToTrans = ss.setUpParametersAges(params)
+def main(argv):
+    params = loaders.readParametersAgeStructured(argv[1])
 
+    ageToTrans = ss.setUpParametersAges(params)
+    # fail now, rather than part-way through the run, if the transition probabilities don't add up
+    ss.setUpTransitionMatrices(ageToTrans, ages, compNames)
 
-dictOfPops = loaders.readPopulationAgeStructured(sys.argv[2])
 
-graph = loaders.genGraphFromContactFile(sys.argv[3])
+    dictOfPops = loaders.readPopulationAgeStructured(argv[2])
 
-states = ss.setupInternalPopulations(graph, compNames, ages, dictOfPops)
+    graph = loaders.genGraphFromContactFile(argv[3])
 
-basicPlots = []
+    states = ss.setupInternalPopulations(graph, compNames, ages, dictOfPops)
 
-time = 200
-numTrials = 100
+    time = 200
+    numTrials = 100
 
-for i in range(numTrials):
-     basicPlots.append(ss.basicSimulationInternalAgeStructure(random.Random(), graph, numInfected, time, genericInfection, ageInfectionMatrix, ageToTrans, states))
+    meanPlot = ensemble.runEnsemble(random.randrange(2**32), numTrials, graph, numInfected, time, genericInfection, ageInfectionMatrix, ageToTrans, states, workers=os.cpu_count())
 
-plt.plot(common.generateMeanPlot(basicPlots), color ='dodgerblue', label='basic')
+    plt.plot(meanPlot, color ='dodgerblue', label='basic')
 
-plt.savefig(sys.argv[4])
+    plt.savefig(argv[4])
+
+
+# the guard matters: worker processes may re-import this module
+if __name__ == "__main__":
+    main(sys.argv)
 
 # 
 # 
@@ -0,0 +1,128 @@
+import numpy as np
+
+from . import network_of_populations, population_engine
+
+# The parts of a model a branch can change
+BRANCH_CHANGES = ["transitions", "mixing", "network"]
+
+
+# CurrentlyInUse
+# Scenario branching for population_engine runs: a run up to some time can be forked into any number of branches
+# that carry on from there under different parameters or a different network (e.g. a lockdown starting at day 30),
+# so the days before the branch are only simulated once.
+# A scenario is a dict with:
+#  - model: the model it was run with
+#  - time: the time it has been run up to, and states: the states at that time
+#  - history: its own part of the history, indexed [time, <leading axes>, node, age, compartment], with the states
+#    from startTime to time (or None with keepHistory=False)
+#  - timeSeriesInfection: its own part of the A+I time series, from startTime to time - 1
+#  - parent: the scenario it was branched from (None for the first one), which has everything before startTime
+# None of these arrays are ever written to again, and they are marked read-only, so branches share their parent's
+# history instead of copying it (use getHistory, getTimeSeries and getStates to see a scenario's whole run).
+# Returns the first scenario: a run from initialStates up to branchTime.
+# generator, stopThreshold and activeFraction are as for population_engine.runSimulation.
+def runPrefix(model, initialStates, branchTime, generator=None, keepHistory=True, stopThreshold=None, activeFraction=None):
+    counters = population_engine.setUpCounters(model, initialStates)
+    return _runScenario(
+        None, model, initialStates, 0, branchTime, counters, generator, keepHistory, stopThreshold, activeFraction
+    )
+
+
+# CurrentlyInUse
+# Forks scenario at the time it was run up to and carries the fork on to timeHorizon. changes replaces parts of the
+# model (any of BRANCH_CHANGES, e.g. {"mixing": lockdownMixing} or {"network": compiledNetwork}) for the branch only.
+# The branch carries on with its own copy of the running counters and of the random generator's state, so every
+# branch of the same scenario makes the same random draws (unless given a generator of its own), and a branch
+# without changes goes exactly as the run would have gone without branching.
+# Branches can be branched again, e.g. to try an intervention at several different times.
+def branch(scenario, timeHorizon, changes=None, generator=None, keepHistory=True, stopThreshold=None, activeFraction=None):
+    changes = changes or {}
+    unknown = [name for name in changes if name not in BRANCH_CHANGES]
+    if unknown:
+        raise ValueError(f"Can't change {', '.join(unknown)} in a branch, only {', '.join(BRANCH_CHANGES)}")
+    if "network" in changes and list(changes["network"]["nodes"]) != list(scenario["model"]["nodes"]):
+        raise ValueError("The network of a branch has to have the same nodes as the scenario it branches from")
+    if timeHorizon < scenario["time"]:
+        raise ValueError(f"Can't branch at time {scenario['time']} to run up to the earlier time {timeHorizon}")
+
+    model = dict(scenario["model"], **changes)
+    if "network" in changes:
+        model["outgoing"] = network_of_populations.csrTranspose(model["network"])
+    counters = population_engine.setUpCounters(model, scenario["states"])
+    counters["nodes"] = scenario["counterNodes"].copy()
+    counters["total"] = scenario["counterTotal"].copy()
+    if generator is None and scenario["generatorState"] is not None:
+        generator = np.random.Generator(getattr(np.random, scenario["generatorState"]["bit_generator"])())
+        generator.bit_generator.state = scenario["generatorState"]
+    return _runScenario(
+        scenario, model, scenario["states"], scenario["time"], timeHorizon, counters, generator, keepHistory,
+        stopThreshold, activeFraction,
+    )
+
+
+def _runScenario(parent, model, initialStates, startTime, timeHorizon, counters, generator, keepHistory, stopThreshold, activeFraction):
+    finalStates = []
+
+    def keepFinal(time, states):
+        if time == timeHorizon:
+            finalStates.append(states.copy())
+
+    # the parent already has the states at startTime
+    firstTime = startTime if parent is None else startTime + 1
+    timeSeriesInfection, history = population_engine.runSimulation(
+        model, initialStates, timeHorizon, keepHistory=list(range(firstTime, timeHorizon + 1)) if keepHistory else False,
+        observers=[keepFinal], counters=counters, generator=generator, stopThreshold=stopThreshold,
+        activeFraction=activeFraction, startTime=startTime,
+    )
+    scenario = {
+        "model": model,
+        "time": timeHorizon,
+        "startTime": firstTime,
+        "states": finalStates[0],
+        "history": history,
+        "timeSeriesInfection": timeSeriesInfection,
+        "counterNodes": counters["nodes"],
+        "counterTotal": counters["total"],
+        "generatorState": None if generator is None else generator.bit_generator.state,
+        "parent": parent,
+    }
+    for name in ["states", "history", "timeSeriesInfection", "counterNodes", "counterTotal"]:
+        if scenario[name] is not None:
+            scenario[name].flags.writeable = False
+    return scenario
+
+
+def _lineage(scenario):
+    scenarios = []
+    while scenario is not None:
+        scenarios.append(scenario)
+        scenario = scenario["parent"]
+    return scenarios[::-1]
+
+
+# CurrentlyInUse
+# The states of scenario at time, which can be before it branched (the array returned is shared, not a copy)
+def getStates(scenario, time):
+    for ancestor in reversed(_lineage(scenario)):
+        if ancestor["startTime"] <= time <= ancestor["time"]:
+            if ancestor["history"] is None:
+                if time == ancestor["time"]:
+                    return ancestor["states"]
+                raise ValueError(f"The states at time {time} were not kept (keepHistory=False)")
+            return ancestor["history"][time - ancestor["startTime"]]
+    raise ValueError(f"Time {time} is not in the run, which goes from 0 to {scenario['time']}")
+
+
+# CurrentlyInUse
+# The whole history of scenario, from time 0, including what it shares with the scenarios it branched from
+def getHistory(scenario):
+    lineage = _lineage(scenario)
+    if any(ancestor["history"] is None for ancestor in lineage):
+        raise ValueError("Part of the history was not kept (keepHistory=False)")
+    return np.concatenate([ancestor["history"] for ancestor in lineage])
+
+
+# CurrentlyInUse
+# The whole A+I time series of scenario, from time 0, indexed [time, <leading axes>] as from runSimulation
+def getTimeSeries(scenario):
+    return np.concatenate([ancestor["timeSeriesInfection"] for ancestor in _lineage(scenario)])
@@ -0,0 +1,126 @@
+import numpy as np
+
+from . import loaders
+
+# How the age bands of the COMIX matrices split into the model's age groups (young is 16 and under, mature 17-69 and
+# old 70 and over, see sample_input_files/data_dictionary.md), as the fraction of the years in each band that fall
+# in each group
+COMIX_AGE_BANDS = {
+    "[0,5)": {"y": 1.0},
+    "[5,18)": {"y": 12/13, "m": 1/13},
+    "[18,30)": {"m": 1.0},
+    "[30,40)": {"m": 1.0},
+    "[40,50)": {"m": 1.0},
+    "[50,60)": {"m": 1.0},
+    "[60,70)": {"m": 1.0},
+    "70+": {"o": 1.0},
+}
+
+# What a period of a schedule can have
+PERIOD_KEYS = ["start", "end", "mixing", "edgeScaling", "nodeMultipliers"]
+
+
+# CurrentlyInUse
+# Turns a mixing matrix by age band (as from loaders.readMixingMatrix) into one by the model's age groups.
+# bandToAge[band][age] is the fraction of band that is in age (e.g. COMIX_AGE_BANDS). The contacts of an age group
+# with another are the average over the bands in the first group, weighted by bandWeights (e.g. the population of
+# each band, all bands weighing the same if not given) and by the fraction in the group, of their contacts with the
+# bands in the second group, counting only the fraction of those in it.
+def aggregateMixingMatrix(matrix, bandToAge, bandWeights=None):
+    missing = [band for band in matrix if band not in bandToAge]
+    if missing:
+        raise ValueError(f"No age group given for the bands {', '.join(missing)}")
+    bands = list(matrix)
+    ages = []
+    for band in bands:
+        ages.extend(age for age in bandToAge[band] if age not in ages)
+    contacts = np.array([[matrix[band][other] for other in bands] for band in bands])
+    fractions = np.array([[bandToAge[band].get(age, 0.0) for age in ages] for band in bands])
+    weights = np.ones(len(bands)) if bandWeights is None else np.array([bandWeights[band] for band in bands], dtype=float)
+
+    participants = fractions * weights[:, np.newaxis]
+    aggregated = (participants.T @ contacts @ fractions) / participants.sum(axis=0)[:, np.newaxis]
+    return {age: {other: float(aggregated[i, j]) for j, other in enumerate(ages)} for i, age in enumerate(ages)}
+
+
+# CurrentlyInUse
+# Reads a COMIX matrix (e.g. sample_input_files/sample_20200327_comix_social_contacts.sampleCSV) as an
+# ageInfectionMatrix for the model's age groups: the contacts are aggregated with aggregateMixingMatrix and then
+# multiplied by infectionProbability, the chance of each contact passing the infection on (see
+# network_of_populations.doInternalInfectionProcess).
+def readCOMIXMatrix(filename, infectionProbability, bandToAge=COMIX_AGE_BANDS, bandWeights=None):
+    aggregated = aggregateMixingMatrix(loaders.readMixingMatrix(filename), bandToAge, bandWeights)
+    return {age: {other: value * infectionProbability for other, value in row.items()} for age, row in aggregated.items()}
+
+
+# CurrentlyInUse
+# Compiles a schedule of changes to a population_engine model over time (e.g. lockdowns) for
+# population_engine.runSimulation, up to timeHorizon. The schedule is a list of periods, each a dict with:
+#  - start, end: the period covers the steps from time start to start + 1, ..., end - 1 to end (end can be left out
+#    for a period that lasts until the end of the run); periods can't overlap, and have to start before timeHorizon
+#    (an end after it is fine, the period is just cut short)
+#  - mixing: the ageInfectionMatrix to use in the period instead of the model's (e.g. from readCOMIXMatrix)
+#  - edgeScaling: a factor to multiply all the movement network's weights by, or a dict {(source, target): factor}
+#    to scale just some of its edges
+#  - nodeMultipliers: a dict {node: factor} scaling all the new infections in those nodes (e.g. a local lockdown)
+# Outside the periods the model is used as it is. Everything is worked out here, once: the returned dict has the
+# mixing matrices, network weights and node multipliers of every period stacked into arrays, indexed [period, ...]
+# with period 0 being the model itself, index, which has the period for each time, and models, with a model for
+# each period made of views into those arrays, so changing period during a run is only a lookup.
+def compileSchedule(model, schedule, timeHorizon):
+    ages = model["ages"]
+    network = model["network"]
+    nodeIndex = {node: n for n, node in enumerate(model["nodes"])}
+    periods = sorted(schedule, key=lambda period: period["start"])
+
+    index = np.zeros(timeHorizon, dtype=np.int64)
+    mixing = np.empty((len(periods) + 1,) + model["mixing"].shape)
+    weights = np.empty((len(periods) + 1, len(network["weights"])))
+    multipliers = np.ones((len(periods) + 1, len(model["nodes"])))
+    mixing[0] = model["mixing"]
+    weights[0] = network["weights"]
+    for k, period in enumerate(periods, 1):
+        unknown = [key for key in period if key not in PERIOD_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown {', '.join(unknown)} in schedule period starting at {period['start']}")
+        start = period["start"]
+        end = period.get("end")
+        if start < 0 or (end is not None and end <= start):
+            raise ValueError(f"Schedule period from {start} to {end} is empty")
+        if start >= timeHorizon:
+            raise ValueError(f"Schedule period from {start} to {end} starts after the end of the run, at {timeHorizon}")
+        if np.any(index[start:end] != 0):
+            raise ValueError(f"Schedule period from {start} to {end} overlaps another one")
+        index[start:end] = k
+
+        mixing[k] = model["mixing"]
+        if "mixing" in period:
+            mixing[k] = [[period["mixing"][ageInf][age] for age in ages] for ageInf in ages]
+        weights[k] = network["weights"]
+        edgeScaling = period.get("edgeScaling", 1.0)
+        if isinstance(edgeScaling, dict):
+            for (source, target), factor in edgeScaling.items():
+                weights[k, _edgePosition(network, nodeIndex, source, target)] *= factor
+        else:
+            weights[k] *= edgeScaling
+        for node, factor in period.get("nodeMultipliers", {}).items():
+            if node not in nodeIndex:
+                raise ValueError(f"Unknown node {node} in schedule period from {start} to {end}")
+            multipliers[k, nodeIndex[node]] = factor
+
+    models = [model]
+    for k in range(1, len(periods) + 1):
+        models.append(dict(model, mixing=mixing[k], network=dict(network, weights=weights[k]), nodeMultipliers=multipliers[k]))
+    return {"index": index, "mixing": mixing, "weights": weights, "nodeMultipliers": multipliers, "models": models}
+
+
+# Where the edge from source to target is in network["weights"] (network has a row per receiving node)
+def _edgePosition(network, nodeIndex, source, target):
+    if source not in nodeIndex or target not in nodeIndex:
+        raise ValueError(f"Unknown node in the edge ({source}, {target})")
+    row = nodeIndex[target]
+    start, end = network["indptr"][row], network["indptr"][row + 1]
+    found = np.flatnonzero(network["indices"][start:end] == nodeIndex[source])
+    if len(found) == 0:
+        raise ValueError(f"There is no edge from {source} to {target} in the network")
+    return start + found[0]
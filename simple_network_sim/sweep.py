@@ -0,0 +1,97 @@
+import copy
+import itertools
+
+import numpy as np
+
+from . import network_of_populations, population_engine
+
+
+# CurrentlyInUse
+# Parameter sweeps with the array engine: every point of the sweep is one entry along a leading "point" axis of the
+# states, with its own transition matrices and mixing matrix, so all of them advance together in a single run, and
+# the graph and populations are only compiled once.
+# A point is a dict from parameter names to values. The names can be:
+#  - "contactRate": every entry of the age mixing matrix (as set up in sampleUseOfModel)
+#  - "genericInfection": kept as a label only, as the model doesn't use it (basicSimulationInternalAgeStructure
+#    takes it but ignores it too)
+#  - a parameter from the parameters file, either for one age as it is written there (e.g. "o,i_to_h") or for every
+#    age (e.g. "e_escape")
+# Anything not in a point keeps its value from the model/ageParams.
+def gridPoints(**values):
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+# CurrentlyInUse
+# The transitions and mixing for each of points, stacked along a new first axis. extraAxes is the number of leading
+# axes the states will have after the point axis (e.g. 1 for [point, trial, node, age, compartment]).
+def sweepModel(model, ageParams, points, extraAxes=0):
+    transitions = []
+    mixing = []
+    for point in points:
+        pointParams = copy.deepcopy(ageParams)
+        pointMixing = model["mixing"].copy()
+        for name, value in point.items():
+            if name == "contactRate":
+                pointMixing[:] = value
+            elif name == "genericInfection":
+                continue
+            elif "," in name:
+                age, param = [part.strip() for part in name.split(",")]
+                if age not in pointParams or param not in pointParams[age]:
+                    raise ValueError(f"Unknown sweep parameter \"{name}\"")
+                pointParams[age][param] = value
+            else:
+                if not all(name in params for params in pointParams.values()):
+                    raise ValueError(f"Unknown sweep parameter \"{name}\"")
+                for params in pointParams.values():
+                    params[name] = value
+        ageToTrans = network_of_populations.setUpParametersAges(pointParams)
+        transitions.append(network_of_populations.setUpTransitionMatrices(ageToTrans, model["ages"], model["compartments"]))
+        mixing.append(pointMixing)
+
+    extra = (1,) * extraAxes
+    swept = dict(model)
+    swept["transitions"] = np.array(transitions).reshape((len(points),) + extra + transitions[0].shape)
+    swept["mixing"] = np.array(mixing).reshape((len(points),) + extra + mixing[0].shape)
+    return swept
+
+
+# CurrentlyInUse
+# Runs every point of a sweep from the same starting states: numInfected mature exposed individuals added in a node
+# picked with rand, as in basicSimulationInternalAgeStructure (so every point has the same seed).
+# Returns a labelled array, as a dict:
+#  - values: the COUNTERS of population_engine for every point and time, indexed [point, time, counter]
+#  - dims: the names of those axes, and coords: the labels along each of them
+#  - parameters: for each parameter name used in the points, its value at each point (nan where not given)
+# e.g. result["values"][:, :, result["coords"]["counter"].index("infectious")] is the A+I time series per point.
+# generator and stopThreshold are passed on to population_engine.runSimulation.
+def runSweep(rand, graph, numInfected, timeHorizon, ageInfectionMatrix, ageParams, nodeStates, points, generator=None, stopThreshold=None):
+    ageToTrans = network_of_populations.setUpParametersAges(ageParams)
+    model = population_engine.compileModel(graph, ageInfectionMatrix, ageToTrans, nodeStates)
+    states = population_engine.statesToArray(model, nodeStates)
+    for vertex in rand.choices(model["nodes"], k=1):
+        states[model["nodes"].index(vertex), model["ages"].index('m'), model["compartments"].index('E')] = numInfected
+
+    swept = sweepModel(model, ageParams, points)
+    initialStates = np.repeat(states[np.newaxis], len(points), axis=0)
+    counters = population_engine.setUpCounters(swept, initialStates)
+    values = np.empty((len(points), timeHorizon + 1, len(counters["names"])))
+
+    def record(time, states):
+        values[:, time] = counters["total"]
+
+    population_engine.runSimulation(
+        swept, initialStates, timeHorizon, keepHistory=False, observers=[record], counters=counters,
+        generator=generator, stopThreshold=stopThreshold,
+    )
+
+    names = []
+    for point in points:
+        names.extend(name for name in point if name not in names)
+    return {
+        "values": values,
+        "dims": ["point", "time", "counter"],
+        "coords": {"point": list(points), "time": list(range(timeHorizon + 1)), "counter": counters["names"]},
+        "parameters": {name: np.array([point.get(name, np.nan) for point in points], dtype=float) for name in names},
+    }
@@ -1,8 +1,11 @@
 import csv
 import os
 
+import numpy
 import pytest
 
+from simple_network_sim import loaders, network_of_populations, population_engine
+
 
 @pytest.fixture
 def age_transitions():
@@ -44,3 +47,56 @@ def age_infection_matrix(age_transitions):
             matrix.setdefault(a, {})[b] = 0.2
 
     yield matrix
+
+
+@pytest.fixture
+def vanilla_transitions():
+    yield network_of_populations.setUpParametersVanilla({
+        "e_escape": 0.427,
+        "a_escape": 0.197,
+        "a_to_i": 0.1,
+        "i_escape": 0.33,
+        "i_to_d": 0.05,
+        "i_to_h": 0.15,
+        "h_escape": 0.1,
+        "h_to_d": 0.42,
+    })
+
+
+@pytest.fixture
+def population_model(age_transitions, demographics, commute_moves, compartment_names, age_infection_matrix):
+    ageParams = loaders.readParametersAgeStructured(age_transitions)
+    ageToTrans = network_of_populations.setUpParametersAges(ageParams)
+    population = loaders.readPopulationAgeStructured(demographics)
+    graph = loaders.genGraphFromContactFile(commute_moves)
+    dictOfStates = network_of_populations.setupInternalPopulations(
+        graph, compartment_names, list(ageToTrans.keys()), population
+    )
+    model = population_engine.compileModel(graph, age_infection_matrix, ageToTrans, dictOfStates[0])
+
+    yield {
+        "ageParams": ageParams,
+        "ageToTrans": ageToTrans,
+        "graph": graph,
+        "dictOfStates": dictOfStates,
+        "model": model,
+        "states": population_engine.statesToArray(model, dictOfStates[0]),
+    }
+
+
+@pytest.fixture
+def exposed_states(population_model, compartment_names):
+    # Returns a function making population_model's states with that many exposed (mature) people added. With trials,
+    # there is a copy of the states for each trial, with the exposed in the node with the same index as the trial, so
+    # each trial starts somewhere else; otherwise they are in the first node.
+    def seed(exposed, trials=None):
+        if trials is None:
+            states = population_model["states"].copy()
+            states[0, population_model["model"]["ages"].index("m"), compartment_names.index("E")] = exposed
+            return states
+        states = numpy.repeat(population_model["states"][numpy.newaxis], trials, axis=0)
+        for trial in range(trials):
+            states[trial, trial, population_model["model"]["ages"].index("m"), compartment_names.index("E")] = exposed
+        return states
+
+    yield seed
@@ -0,0 +1,57 @@
+import copy
+import random
+
+import pytest
+
+from simple_network_sim import common, network_of_populations as np, loaders, population_engine as engine
+
+
+def test_basic_simulation_matches_dict_engine(
+    age_transitions, demographics, commute_moves, compartment_names, age_infection_matrix
+):
+    age_to_trans = np.setUpParametersAges(loaders.readParametersAgeStructured(age_transitions))
+    population = loaders.readPopulationAgeStructured(demographics)
+    graph = loaders.genGraphFromContactFile(commute_moves)
+    states = np.setupInternalPopulations(graph, compartment_names, list(age_to_trans.keys()), population)
+
+    kwargs = dict(
+        graph=graph,
+        numInfected=10,
+        timeHorizon=200,
+        genericInfection=0.1,
+        ageInfectionMatrix=age_infection_matrix,
+        diseaseProgressionProbs=age_to_trans,
+    )
+    expected = np.basicSimulationInternalAgeStructure(rand=random.Random(1), dictOfStates=copy.deepcopy(states), **kwargs)
+    result = engine.basicSimulationInternalAgeStructure(rand=random.Random(1), dictOfStates=states, **kwargs)
+
+    assert result == pytest.approx(expected)
+
+
+def test_basic_simulation_many_runs_matches_dict_engine(
+    age_transitions, demographics, commute_moves, compartment_names, age_infection_matrix
+):
+    age_to_trans = np.setUpParametersAges(loaders.readParametersAgeStructured(age_transitions))
+    population = loaders.readPopulationAgeStructured(demographics)
+    graph = loaders.genGraphFromContactFile(commute_moves)
+
+    means = []
+    for simulate in [np.basicSimulationInternalAgeStructure, engine.basicSimulationInternalAgeStructure]:
+        states = np.setupInternalPopulations(graph, compartment_names, list(age_to_trans.keys()), population)
+        rand = random.Random(1)
+        runs = [
+            simulate(
+                rand=rand,
+                graph=graph,
+                numInfected=10,
+                timeHorizon=200,
+                genericInfection=0.1,
+                ageInfectionMatrix=age_infection_matrix,
+                diseaseProgressionProbs=age_to_trans,
+                dictOfStates=states,
+            )
+            for _ in range(10)
+        ]
+        means.append(common.generateMeanPlot(runs))
+
+    assert means[1] == pytest.approx(means[0])
@@ -0,0 +1,33 @@
+import random
+
+from benchmarks import run_benchmarks, synthetic_inputs
+from simple_network_sim import loaders
+
+
+def test_writeInputs_readable_by_loaders(tmp_path):
+    inputs = synthetic_inputs.writeInputs(str(tmp_path), 20, 3, random.Random(0))
+
+    params = loaders.readParametersAgeStructured(inputs["parameters"])
+    population = loaders.readPopulationAgeStructured(inputs["population"])
+    graph = loaders.genGraphFromContactFile(inputs["commutes"])
+
+    assert sorted(params) == ["m", "o", "y"]
+    assert len(population) == 20
+    assert graph.number_of_nodes() == 20
+    assert graph.number_of_edges() == inputs["edges"] == 20 * 4
+    assert all(graph.has_edge(node, node) for node in graph.nodes())
+
+
+def test_runCase_times_every_phase():
+    result = run_benchmarks.runCase(10, 2, 3, 1, 0, ["dict", "array"])
+
+    assert result["edges"] == 30
+    for name in ["load.edges", "load.graph", "dict.progression", "dict.betweenInfection", "array.timestep", "array.run"]:
+        assert result["timings"][name] >= 0.0
+
+
+def test_compareResults():
+    baseline = {"results": [{"nodes": 10, "edgesPerNode": 2, "timeHorizon": 3, "timings": {"a": 1.0, "b": 1.0, "c": 1e-5}}]}
+    results = {"results": [{"nodes": 10, "edgesPerNode": 2, "timeHorizon": 3, "timings": {"a": 1.1, "b": 1.5, "c": 1e-4}}]}
+
+    assert run_benchmarks.compareResults(baseline, results, 0.2) == [(10, 2, "b", 1.0, 1.5)]
@@ -0,0 +1,84 @@
+import numpy
+import pytest
+
+from simple_network_sim import checkpoint, population_engine as engine
+
+
+class Preempted(Exception):
+    pass
+
+
+def _preemptAt(stopTime):
+    def observer(time, states):
+        if time == stopTime:
+            raise Preempted()
+
+    return observer
+
+
+@pytest.mark.parametrize("stochastic", [False, True])
+@pytest.mark.parametrize("options", [{}, {"stopThreshold": 0, "activeFraction": 0.5}])
+def test_resume_is_identical_to_uninterrupted_run(tmp_path, population_model, exposed_states, stochastic, options):
+    model = population_model["model"]
+    initialStates = exposed_states(5, trials=4)
+    filename = str(tmp_path / "run.npz")
+
+    def generator():
+        return numpy.random.default_rng(7) if stochastic else None
+
+    expected, _ = engine.runSimulation(model, initialStates, 60, keepHistory=False, generator=generator(), **options)
+    with pytest.raises(Preempted):
+        checkpoint.runWithCheckpoints(
+            model, initialStates, 60, filename, 10, observers=[_preemptAt(27)], generator=generator(), **options
+        )
+    assert checkpoint.loadCheckpoint(filename, model)["time"] == 20
+    with pytest.raises(Preempted):
+        checkpoint.resumeSimulation(filename, model, 60, every=10, observers=[_preemptAt(45)], **options)
+    assert checkpoint.loadCheckpoint(filename, model)["time"] == 40
+
+    resumed = checkpoint.resumeSimulation(filename, model, 60, **options)
+
+    numpy.testing.assert_array_equal(resumed, expected)
+
+
+def test_checkpoint_roundtrip(tmp_path, population_model, exposed_states):
+    model = population_model["model"]
+    states = exposed_states(5, trials=4)
+    model["mixing"] = model["mixing"] * 0.5
+    counters = engine.setUpCounters(model, states)
+    generator = numpy.random.default_rng(3)
+    generator.random(10)
+    filename = str(tmp_path / "run.npz")
+
+    checkpoint.saveCheckpoint(filename, model, states, 12, counters, generator, numpy.ones((12, 4)))
+    loaded = checkpoint.loadCheckpoint(filename, dict(model, mixing=model["mixing"] * 2))
+
+    assert loaded["time"] == 12
+    numpy.testing.assert_array_equal(loaded["states"], states)
+    numpy.testing.assert_array_equal(loaded["model"]["mixing"], model["mixing"])
+    numpy.testing.assert_array_equal(loaded["counters"]["total"], counters["total"])
+    numpy.testing.assert_array_equal(loaded["timeSeriesInfection"], numpy.ones((12, 4)))
+    assert loaded["generator"].random() == generator.random()
+
+
+def test_loadCheckpoint_rejects_other_model(tmp_path, population_model, exposed_states):
+    model = population_model["model"]
+    states = exposed_states(5, trials=4)
+    filename = str(tmp_path / "run.npz")
+    checkpoint.saveCheckpoint(filename, model, states, 0, engine.setUpCounters(model, states))
+
+    with pytest.raises(ValueError):
+        checkpoint.loadCheckpoint(filename, dict(model, nodes=list(reversed(model["nodes"]))))
+    assert checkpoint.loadCheckpoint(filename, model)["generator"] is None
+
+
+def test_runSimulation_startTime(population_model, exposed_states):
+    model = population_model["model"]
+    states = exposed_states(5, trials=4)
+    full, history = engine.runSimulation(model, states, 20)
+
+    rest, restHistory = engine.runSimulation(model, history[8], 20, startTime=8)
+
+    assert rest.shape == (12, 4)
+    numpy.testing.assert_allclose(rest, full[8:])
+    numpy.testing.assert_allclose(restHistory, history[8:])
@@ -0,0 +1,53 @@
+import copy
+
+import pytest
+
+from simple_network_sim import common, ensemble, network_of_populations as np, population_engine
+
+
+@pytest.fixture
+def setup(population_model, age_infection_matrix):
+    yield dict(
+        graph=population_model["graph"],
+        numInfected=10,
+        timeHorizon=20,
+        genericInfection=0.1,
+        ageInfectionMatrix=age_infection_matrix,
+        diseaseProgressionProbs=population_model["ageToTrans"],
+        dictOfStates=population_model["dictOfStates"],
+    )
+
+
+def test_trialRandom_is_deterministic():
+    assert ensemble.trialRandom(1, 3).random() == ensemble.trialRandom(1, 3).random()
+    assert ensemble.trialRandom(1, 3).random() != ensemble.trialRandom(1, 4).random()
+    assert ensemble.trialRandom(1, 23).random() != ensemble.trialRandom(12, 3).random()
+
+
+@pytest.mark.parametrize("numTrials", [0, -1])
+def test_runEnsemble_needs_trials(setup, numTrials):
+    with pytest.raises(ValueError):
+        ensemble.runEnsemble(7, numTrials, **setup)
+
+
+def test_runEnsemble_matches_sequential_runs(setup):
+    original = copy.deepcopy(setup["dictOfStates"])
+    seen = []
+
+    result = ensemble.runEnsemble(7, 5, callback=lambda trial, series: seen.append(trial), **setup)
+
+    runs = []
+    for trial in range(5):
+        kwargs = dict(setup, dictOfStates=copy.deepcopy(original))
+        runs.append(np.basicSimulationInternalAgeStructure(rand=ensemble.trialRandom(7, trial), **kwargs))
+    assert result == common.generateMeanPlot(runs)
+    assert sorted(seen) == list(range(5))
+    assert setup["dictOfStates"] == original
+
+
+@pytest.mark.parametrize("simulate", [np.basicSimulationInternalAgeStructure, population_engine.basicSimulationInternalAgeStructure])
+def test_runEnsemble_independent_of_workers(setup, simulate):
+    serial = ensemble.runEnsemble(3, 6, workers=1, simulate=simulate, **setup)
+    parallel = ensemble.runEnsemble(3, 6, workers=3, simulate=simulate, **setup)
+
+    assert serial == parallel
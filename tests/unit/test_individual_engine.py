@@ -0,0 +1,104 @@
+import networkx as nx
+import numpy
+import pytest
+
+from simple_network_sim import individual_engine as engine
+
+
+def test_compileModel_neighbours(vanilla_transitions):
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", weight=0.5)
+    graph.add_edge("a", "c")
+    graph.add_edge("c", "a", weight=0.25)
+    graph.add_node("d")
+
+    model = engine.compileModel(graph, vanilla_transitions, 0.1)
+
+    assert model["nodes"] == ["a", "b", "c", "d"]
+    assert model["indptr"].tolist() == [0, 2, 2, 3, 3]
+    assert model["indices"].tolist() == [1, 2, 0]
+    assert model["probs"].tolist() == [0.5, 0.1, 0.25]
+    assert model["indices"].dtype == numpy.int32
+
+
+def test_statesToArray_roundtrip(vanilla_transitions):
+    graph = nx.path_graph(["a", "b", "c"])
+    model = engine.compileModel(graph, vanilla_transitions, 0.1)
+    states = {"a": "S", "b": "I", "c": "R"}
+
+    array = engine.statesToArray(model, states)
+
+    assert array.dtype == numpy.int8
+    assert engine.arrayToStates(model, array) == states
+
+
+def test_doProgression_distribution(vanilla_transitions):
+    model = engine.compileModel(nx.empty_graph(1), vanilla_transitions, 0.1)
+    states = numpy.full(100000, engine.STATES.index("I"), dtype=numpy.int8)
+
+    nextStates = engine.doProgression(model, states, numpy.random.default_rng(1))
+
+    counts = numpy.bincount(nextStates, minlength=len(engine.STATES)) / len(states)
+    for state, prob in vanilla_transitions["I"].items():
+        assert counts[engine.STATES.index(state)] == pytest.approx(prob, abs=0.01)
+    assert engine.doProgression(model, numpy.zeros(10, dtype=numpy.int8), numpy.random.default_rng(1)).tolist() == [0] * 10
+
+
+def test_doInfection_certain_and_impossible(vanilla_transitions):
+    graph = nx.DiGraph()
+    graph.add_edge(0, 1, weight=1.0)
+    graph.add_edge(0, 2, weight=0.0)
+    graph.add_edge(3, 4, weight=1.0)
+    graph.add_edge(0, 5, weight=1.0)
+    model = engine.compileModel(graph, vanilla_transitions, 0.1)
+    states = engine.statesToArray(model, {0: "I", 1: "S", 2: "S", 3: "S", 4: "S", 5: "R"})
+
+    infected = engine.doInfection(model, states, numpy.random.default_rng(1))
+
+    assert [model["nodes"][i] for i in infected] == [1]
+
+
+def test_basicSimulation(vanilla_transitions):
+    graph = nx.fast_gnp_random_graph(500, 0.02, seed=1)
+    model = engine.compileModel(graph, vanilla_transitions, 0.1)
+
+    series, states = engine.basicSimulation(numpy.random.default_rng(4), model, 3, 60)
+    again, _ = engine.basicSimulation(numpy.random.default_rng(4), model, 3, 60)
+
+    assert series == again
+    assert len(series) == 60
+    assert 0 < series[0] <= 3
+    assert (states != engine.STATES.index("S")).sum() > 3
+
+
+def test_generateHouseholdNetwork():
+    network = engine.generateHouseholdNetwork(numpy.random.default_rng(2), 300, 0.08)
+    positions = network["positions"]
+    distances = ((positions[:, numpy.newaxis] - positions[numpy.newaxis]) ** 2).sum(axis=-1)
+    expected = (distances <= 0.08 ** 2) & ~numpy.eye(300, dtype=bool)
+
+    neighbourhoods = network["neighbourhoods"]
+    adjacency = numpy.zeros((300, 300), dtype=bool)
+    for household in range(300):
+        adjacency[household, neighbourhoods["indices"][neighbourhoods["indptr"][household]:neighbourhoods["indptr"][household + 1]]] = True
+    numpy.testing.assert_array_equal(adjacency, expected)
+
+    graph = engine.householdNetworkToGraph(network)
+    assert graph.number_of_nodes() == len(network["household"])
+    assert 2 * graph.number_of_edges() == network["indptr"][-1]
+    for (h1, m1), (h2, m2) in graph.edges():
+        assert h1 == h2 or expected[h1, h2]
+    for household in range(5):
+        members = [node for node in graph.nodes() if node[0] == household]
+        assert graph.subgraph(members).number_of_edges() == len(members) * (len(members) - 1) // 2
+
+
+def test_compileModel_from_household_network(vanilla_transitions):
+    network = engine.generateHouseholdNetwork(numpy.random.default_rng(2), 100, 0.1)
+
+    model = engine.compileModel(None, vanilla_transitions, 0.1, network=network)
+    series, _ = engine.basicSimulation(numpy.random.default_rng(1), model, 2, 10)
+
+    assert len(model["nodes"]) == len(network["household"])
+    assert (model["probs"] == 0.1).all()
+    assert len(series) == 10
@@ -0,0 +1,89 @@
+import os
+import shutil
+
+import networkx as nx
+import numpy
+import pytest
+
+from simple_network_sim import input_cache, loaders
+
+
+@pytest.mark.parametrize(
+    "loaderName,inputName",
+    [
+        ("readParametersAgeStructured", "age_transitions"),
+        ("readPopulationAgeStructured", "demographics"),
+        ("readNodeAttributesJSON", "locations"),
+    ],
+)
+def test_cached_loaders_match_loaders(loaderName, inputName, request, tmpdir):
+    filename = request.getfixturevalue(inputName)
+    expected = getattr(loaders, loaderName)(filename)
+
+    first = getattr(input_cache, loaderName)(filename, str(tmpdir))
+    assert len(os.listdir(str(tmpdir))) == 1
+    second = getattr(input_cache, loaderName)(filename, str(tmpdir))
+
+    assert first == expected
+    assert second == expected
+    assert list(second) == list(expected)
+
+
+def test_readEdgeListArrays_cached(commute_moves, tmpdir):
+    expected = loaders.readEdgeListArrays(commute_moves)
+    input_cache.readEdgeListArrays(commute_moves, str(tmpdir))
+    nodes, sources, targets, weights = input_cache.readEdgeListArrays(commute_moves, str(tmpdir))
+
+    assert nodes == expected[0]
+    numpy.testing.assert_array_equal(sources, expected[1])
+    numpy.testing.assert_array_equal(targets, expected[2])
+    numpy.testing.assert_array_equal(weights, expected[3])
+
+
+def test_genGraphFromContactFile_cached(commute_moves, tmpdir):
+    input_cache.genGraphFromContactFile(commute_moves, str(tmpdir))
+    graph = input_cache.genGraphFromContactFile(commute_moves, str(tmpdir))
+
+    assert nx.is_isomorphic(graph, loaders.genGraphFromContactFile(commute_moves), edge_match=lambda a, b: a == b)
+
+
+def test_cache_is_used(age_transitions, tmpdir, monkeypatch):
+    input_cache.readParametersAgeStructured(age_transitions, str(tmpdir))
+
+    def fail(filename):
+        raise AssertionError("file parsed again")
+
+    monkeypatch.setattr(loaders, "readParametersAgeStructured", fail)
+    assert input_cache.readParametersAgeStructured(age_transitions, str(tmpdir))["m"]["e_escape"] == 0.427
+
+
+def test_cache_invalidated_by_content(age_transitions, tmpdir):
+    filename = str(tmpdir / "params.csv")
+    shutil.copy(age_transitions, filename)
+    cacheDir = str(tmpdir / "cache")
+    input_cache.readParametersAgeStructured(filename, cacheDir)
+
+    with open(filename) as fp:
+        contents = fp.read()
+    with open(filename, "w") as fp:
+        fp.write(contents.replace("0.427", "0.5"))
+
+    assert input_cache.readParametersAgeStructured(filename, cacheDir)["m"]["e_escape"] == 0.5
+    assert len(os.listdir(cacheDir)) == 2
+
+
+def test_cache_invalidated_by_version(age_transitions, tmpdir, monkeypatch):
+    input_cache.readParametersAgeStructured(age_transitions, str(tmpdir))
+    monkeypatch.setattr(input_cache, "CACHE_VERSION", input_cache.CACHE_VERSION + 1)
+    input_cache.readParametersAgeStructured(age_transitions, str(tmpdir))
+
+    assert len(os.listdir(str(tmpdir))) == 2
+
+
+def test_unreadable_cache_entry_is_replaced(age_transitions, tmpdir):
+    cached = input_cache.cacheFilename(str(tmpdir), "parameters", age_transitions)
+    with open(cached, "w") as fp:
+        fp.write("not an npz file")
+
+    assert input_cache.readParametersAgeStructured(age_transitions, str(tmpdir)) == loaders.readParametersAgeStructured(age_transitions)
+    assert input_cache.readParametersAgeStructured(age_transitions, str(tmpdir)) == loaders.readParametersAgeStructured(age_transitions)
@@ -248,3 +248,74 @@ def test_genGraphFromContactFile(commute_moves):
     graph = nx.read_edgelist(commute_moves, create_using=nx.DiGraph, delimiter=",", data=(("weight", float),))
 
     assert nx.is_isomorphic(loaders.genGraphFromContactFile(commute_moves), graph)
+
+
+def test_readEdgeListArrays(commute_moves):
+    graph = nx.read_edgelist(commute_moves, create_using=nx.DiGraph, delimiter=",", data=(("weight", float),))
+
+    nodes, sources, targets, weights = loaders.readEdgeListArrays(commute_moves)
+
+    assert nodes == list(graph.nodes())
+    edges = {(nodes[s], nodes[t]): w for s, t, w in zip(sources, targets, weights)}
+    assert edges == {(u, v): data["weight"] for u, v, data in graph.edges(data=True)}
+
+
+def test_readEdgeListArrays_sums_duplicates():
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as fp:
+        fp.write("b,a,1\na,b,2.5\n\nb,a,4\n# a comment\na,a,3\n")
+        fp.flush()
+        nodes, sources, targets, weights = loaders.readEdgeListArrays(fp.name)
+
+    assert nodes == ["b", "a"]
+    assert list(zip(sources.tolist(), targets.tolist(), weights.tolist())) == [(0, 1, 5.0), (1, 0, 2.5), (1, 1, 3.0)]
+
+
+def test_readEdgeListArrays_empty_file():
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as fp:
+        nodes, sources, targets, weights = loaders.readEdgeListArrays(fp.name)
+
+    assert nodes == []
+    assert len(sources) == len(targets) == len(weights) == 0
+
+
+def test_readEdgeListArrays_misaligned_lines_that_balance_out():
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as fp:
+        fp.write("a,b,1,c\nd,2\n")
+        fp.flush()
+        with pytest.raises(Exception):
+            loaders.readEdgeListArrays(fp.name)
+
+
+@pytest.mark.parametrize("row", ["a,b", "a,b,1,2", "a,b,wrong"])
+def test_readEdgeListArrays_malformed(row):
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as fp:
+        fp.write("a,c,1\n" + row + "\n")
+        fp.flush()
+        with pytest.raises(Exception):
+            loaders.readEdgeListArrays(fp.name)
+
+
+def test_edgeArraysToGraph(commute_moves):
+    graph = loaders.edgeArraysToGraph(*loaders.readEdgeListArrays(commute_moves))
+    expected = nx.read_edgelist(commute_moves, create_using=nx.DiGraph, delimiter=",", data=(("weight", float),))
+
+    assert list(graph.nodes()) == list(expected.nodes())
+    assert {(u, v): d for u, v, d in graph.edges(data=True)} == {(u, v): d for u, v, d in expected.edges(data=True)}
+
+
+def test_readMixingMatrix():
+    with tempfile.NamedTemporaryFile(mode="w+", encoding="utf-8-sig", delete=False) as fp:
+        fp.write(',"[0,5)",5+\n"[0,5)",1.5,2\n5+,3,4.25\n')
+        fp.flush()
+        matrix = loaders.readMixingMatrix(fp.name)
+
+    assert matrix == {"[0,5)": {"[0,5)": 1.5, "5+": 2.0}, "5+": {"[0,5)": 3.0, "5+": 4.25}}
+
+
+@pytest.mark.parametrize("rows", ["", ",a,b\na,1,2\nb,3\n", ",a,b\na,1,2\nb,3,x\n", ",a,b\na,1,2\nc,3,4\n"])
+def test_readMixingMatrix_malformed(rows):
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as fp:
+        fp.write(rows)
+        fp.flush()
+        with pytest.raises(ValueError):
+            loaders.readMixingMatrix(fp.name)
@@ -0,0 +1,80 @@
+import collections
+import math
+import random
+
+import networkx as nx
+import pytest
+
+from simple_network_sim import network_of_individuals as ni
+
+
+def test_basicSimulation(vanilla_transitions):
+    random.seed(3)
+    graph = nx.fast_gnp_random_graph(100, 0.05, seed=3)
+
+    result = ni.basicSimulation(graph, 5, 10, 0.1, vanilla_transitions)
+
+    assert len(result) == 10
+    assert 0 < result[0] <= 5
+
+
+def test_eventDrivenSimulation_certain_infection():
+    graph = nx.path_graph(["a", "b", "c"])
+    transitions = {"E": {"E": 1.0}, "I": {"I": 1.0}}
+    states = {}
+
+    result = ni.eventDrivenSimulation(random.Random(1), graph, 1, 5, 1.0, transitions, states)
+
+    assert result == [1] * 5
+    assert sorted(states.values()) == ["E", "I", "S"]
+    assert states["b"] == "E"
+
+
+def test_eventDrivenSimulation_no_seeds(vanilla_transitions):
+    graph = nx.path_graph(10)
+    states = {}
+
+    assert ni.eventDrivenSimulation(random.Random(1), graph, 0, 5, 0.5, vanilla_transitions, states) == [0] * 5
+    assert set(states.values()) == {"S"}
+
+
+def test_eventDrivenSimulation_reproducible(vanilla_transitions):
+    graph = nx.fast_gnp_random_graph(500, 0.02, seed=1)
+    states = {}
+
+    result = ni.eventDrivenSimulation(random.Random(5), graph, 3, 60, 0.1, vanilla_transitions, states)
+
+    assert result == ni.eventDrivenSimulation(random.Random(5), graph, 3, 60, 0.1, vanilla_transitions)
+    assert len(states) == 500
+    assert set(states.values()) <= {"S", "E", "A", "I", "H", "R", "D"}
+    assert sum(state != "S" for state in states.values()) > 3
+
+
+def _endStates(graph, timeHorizon, genericInfection, transitions, runs=4000):
+    rand = random.Random(2)
+    counts = collections.Counter()
+    for _ in range(runs):
+        states = {}
+        ni.eventDrivenSimulation(rand, graph, 1, timeHorizon, genericInfection, transitions, states)
+        counts.update(states.values())
+    return counts
+
+
+@pytest.mark.parametrize("timeHorizon", [1, 3])
+def test_eventDrivenSimulation_matches_step_probabilities(timeHorizon):
+    # over whole timesteps, the exponential waiting times have to give the same chances as the discrete model
+    runs = 4000
+    transitions = {"I": {"I": 0.6, "R": 0.3, "D": 0.1}}
+    stay = 0.6**timeHorizon
+    expected = {"I": stay, "R": (1 - stay)*0.75, "D": (1 - stay)*0.25}
+
+    counts = _endStates(nx.empty_graph(1), timeHorizon, 0.0, transitions, runs)
+
+    for state, prob in expected.items():
+        assert counts[state]/runs == pytest.approx(prob, abs=4*math.sqrt(prob*(1 - prob)/runs))
+
+    # someone next to an infectious individual gets infected in each step with the probability of the edge
+    escaped = 0.8**timeHorizon
+    counts = _endStates(nx.path_graph(2), timeHorizon, 0.2, {"E": {"E": 1.0}, "I": {"I": 1.0}}, runs)
+
+    assert counts["S"]/runs == pytest.approx(escaped, abs=4*math.sqrt(escaped*(1 - escaped)/runs))
@@ -110,3 +110,153 @@ def test_doInternalProgressionAllNodes_overwrite_state():
     }
 
     assert states == expected
+
+
+def test_compileNetwork_drops_self_loops_and_defaults_weights():
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", weight=2.0)
+    graph.add_edge("c", "b", weight=3.0)
+    graph.add_edge("b", "b", weight=100.0)
+    graph.add_edge("b", "a")
+
+    network = np.compileNetwork(graph)
+
+    assert network["nodes"] == ["a", "b", "c"]
+    assert list(network["indptr"]) == [0, 1, 3, 3]
+    assert list(network["indices"]) == [1, 0, 2]
+    assert list(network["weights"]) == [1.0, 2.0, 3.0]
+
+
+def test_compileNetworkFromArrays_sums_duplicates():
+    network = np.compileNetworkFromArrays(["a", "b"], [0, 0, 1], [1, 1, 0], [1.0, 2.5, 4.0])
+
+    assert list(network["indptr"]) == [0, 1, 2]
+    assert list(network["indices"]) == [1, 0]
+    assert list(network["weights"]) == [4.0, 3.5]
+
+
+def test_csrMatVec():
+    network = np.compileNetworkFromArrays(["a", "b", "c", "d"], [0, 2, 1], [1, 1, 2], [2.0, 3.0, 0.5])
+
+    assert list(np.csrMatVec(network, [1.0, 10.0, 100.0, 1000.0])) == [0.0, 302.0, 5.0, 0.0]
+    assert np.csrMatVec(network, [[1.0, 2.0]] * 4).tolist() == [[0.0, 0.0], [5.0, 10.0], [0.5, 1.0], [0.0, 0.0]]
+
+
+def test_csrTranspose_and_csrRows():
+    network = np.compileNetworkFromArrays(["a", "b", "c", "d"], [0, 2, 1, 3], [1, 1, 2, 2], [2.0, 3.0, 0.5, 7.0])
+
+    outgoing = np.csrTranspose(network)
+    assert outgoing["indptr"].tolist() == [0, 1, 2, 3, 4]
+    assert outgoing["indices"].tolist() == [1, 2, 1, 2]
+    assert outgoing["weights"].tolist() == [2.0, 0.5, 3.0, 7.0]
+
+    rows = np.csrRows(network, [2])
+    assert rows["columns"].tolist() == [1, 3]
+    assert list(np.csrMatVec(rows, [10.0, 1000.0])) == [5.0 + 7000.0]
+
+
+def test_doBetweenInfectionAgeStructured_matches_edge_by_edge_sum():
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", weight=2.0)
+    graph.add_edge("c", "b", weight=3.0)
+    states = {0: {}, 1: {}}
+    for node, (sus, inf) in {"a": (90.0, 10.0), "b": (100.0, 0.0), "c": (50.0, 50.0)}.items():
+        states[0][node] = {("m", "S"): sus, ("m", "E"): 0.0, ("m", "A"): 0.0, ("m", "I"): inf}
+        states[1][node] = dict(states[0][node])
+
+    np.doBetweenInfectionAgeStructured(graph, states, 0, 0.1)
+
+    assert states[1]["b"][("m", "E")] == pytest.approx(2.0 * 0.1 + 3.0 * 0.5)
+    assert states[1]["b"][("m", "S")] == pytest.approx(100.0 - 2.0 * 0.1 - 3.0 * 0.5)
+    assert states[1]["a"] == states[0]["a"]
+
+
+def test_setUpTransitionMatrices(age_transitions):
+    age_to_trans = np.setUpParametersAges(loaders.readParametersAgeStructured(age_transitions))
+
+    transitions = np.setUpTransitionMatrices(age_to_trans, ["y", "o"], ["S", "E", "A", "I", "H", "R", "D"])
+
+    assert transitions.shape == (2, 7, 7)
+    assert transitions.sum(axis=2) == pytest.approx(1.0)
+    assert transitions[0, 0, 0] == 1.0
+    assert transitions[1, 1, 1] == pytest.approx(1 - 0.427)
+    assert transitions[1, 1, 2] == pytest.approx(0.427)
+
+
+def test_setUpTransitionMatrices_rejects_leaking_rows():
+    probs = {"o": {"E": {"E": 0.5, "A": 0.4}, "A": {"A": 1.0}}}
+
+    with pytest.raises(ValueError, match="age \"o\" state \"E\""):
+        np.setUpTransitionMatrices(probs, ["o"], ["S", "E", "A"])
+
+
+def test_setUpTransitionMatrices_rejects_negative_probabilities():
+    params = {"e_escape": 0.5, "a_escape": 0.5, "a_to_i": 0.5, "i_escape": 0.5, "i_to_d": 0.6, "i_to_h": 0.6,
+              "h_escape": 0.5, "h_to_d": 0.5}
+    probs = np.setUpParametersAges({"m": params})
+
+    with pytest.raises(ValueError, match="state \"I\""):
+        np.setUpTransitionMatrices(probs, ["m"], ["S", "E", "A", "I", "H", "R", "D"])
+
+
+def test_summariseNode_matches_individual_totals():
+    node_state = {("o", "S"): 0.1, ("m", "S"): 0.2, ("o", "A"): 0.3, ("m", "I"): 0.7, ("o", "I"): 1e-17, ("m", "R"): 3.0}
+
+    summary = np.summariseNode(node_state)
+
+    assert summary["total"] == np.totalIndividuals(node_state)
+    assert summary["infected"] == np.getTotalInfected(node_state)
+    assert summary["suscept"] == np.getTotalSuscept(node_state)
+    assert summary["byAge"] == {age: np.getTotalInAge(node_state, age) for age in ["o", "m"]}
+
+
+def test_getNodeSummaries_recomputes_on_new_time():
+    states = {0: {"a": {("m", "S"): 1.0}}, 1: {"a": {("m", "S"): 2.0}}}
+    cache = {}
+
+    first = np.getNodeSummaries(cache, states, 0)
+    assert np.getNodeSummaries(cache, states, 0) is first
+    assert np.getNodeSummaries(cache, states, 1)["a"]["suscept"] == 2.0
+
+    states[1] = {"a": {("m", "S"): 5.0}}
+    assert np.getNodeSummaries(cache, states, 1)["a"]["suscept"] == 5.0
+
+
+def test_basicSimulationInternalAgeStructure_stopThreshold(population_model, age_infection_matrix):
+    graph, age_to_trans = population_model["graph"], population_model["ageToTrans"]
+    states = population_model["dictOfStates"]
+
+    result = np.basicSimulationInternalAgeStructure(
+        rand=random.Random(1),
+        graph=graph,
+        numInfected=10,
+        timeHorizon=20,
+        genericInfection=0.1,
+        ageInfectionMatrix=age_infection_matrix,
+        diseaseProgressionProbs=age_to_trans,
+        dictOfStates=states,
+        stopThreshold=1e9,
+    )
+
+    assert result == [0] * 20
+    assert sorted(states) == list(range(21))
+    assert states[1] == states[0] and states[1] is not states[0]
+    assert all(states[time] is states[1] for time in range(2, 21))
+
+
+def test_basicSimulationInternalAgeStructure_rerun_after_stopThreshold(population_model, age_infection_matrix):
+    graph, age_to_trans = population_model["graph"], population_model["ageToTrans"]
+    states = population_model["dictOfStates"]
+    fresh = copy.deepcopy(states)
+
+    def run(dictOfStates, stopThreshold=None):
+        return np.basicSimulationInternalAgeStructure(
+            random.Random(1), graph, 10, 50, 0.1, age_infection_matrix, age_to_trans, dictOfStates,
+            stopThreshold=stopThreshold,
+        )
+
+    run(states, stopThreshold=20)
+    rerun = run(states)
+
+    assert rerun == pytest.approx(run(fresh))
+    assert states == fresh
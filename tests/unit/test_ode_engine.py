@@ -0,0 +1,85 @@
+import numpy
+import pytest
+
+from simple_network_sim import ode_engine, population_engine as engine
+
+
+def test_dense_output_matches_step():
+    # at theta = 1 the continuous extension has to give the 5th order solution
+    numpy.testing.assert_allclose(ode_engine._P.sum(axis=1), ode_engine._B, atol=1e-12)
+
+
+def test_dormandPrince_exponential():
+    rates = numpy.array([0.5, 2.0, -1.0])
+    times = numpy.linspace(0.0, 3.0, 13)
+    stats = {}
+
+    result = ode_engine.dormandPrince(lambda t, y: rates * y, numpy.ones(3), times, rtol=1e-9, atol=1e-12, stats=stats)
+
+    numpy.testing.assert_allclose(result, numpy.exp(numpy.outer(times, rates)), rtol=1e-7)
+    assert stats["steps"] < len(times) * 10
+    assert stats["evaluations"] >= 6 * stats["steps"]
+
+
+def test_dormandPrince_takes_long_steps_when_quiet():
+    stats = {}
+    ode_engine.dormandPrince(lambda t, y: -0.01 * y, numpy.ones(1), [0.0, 100.0], rtol=1e-6, atol=1e-6, stats=stats)
+
+    assert stats["steps"] < 20
+
+
+def test_dormandPrince_rejects_decreasing_times():
+    with pytest.raises(ValueError):
+        ode_engine.dormandPrince(lambda t, y: y, numpy.ones(1), [0.0, 2.0, 1.0])
+
+
+@pytest.mark.parametrize("fun", [
+    lambda t, y: numpy.full_like(y, numpy.nan),
+    lambda t, y: -y if t < 1.0 else y*numpy.nan,
+])
+def test_dormandPrince_rejects_nan(fun):
+    with pytest.raises(ValueError):
+        ode_engine.dormandPrince(fun, numpy.ones(2), [0.0, 2.0])
+
+
+def test_progressionRates_match_daily_staying_probability(population_model):
+    model = population_model["model"]
+
+    rates = ode_engine.progressionRates(model)
+
+    numpy.testing.assert_allclose(rates.sum(axis=-1), 0.0, atol=1e-12)
+    stay = numpy.diagonal(model["transitions"], axis1=-2, axis2=-1)
+    numpy.testing.assert_allclose(numpy.exp(numpy.diagonal(rates, axis1=-2, axis2=-1)), stay)
+
+
+def test_runODESimulation_without_infection_decays_like_discrete_model(population_model, compartment_names):
+    model, states = population_model["model"], population_model["states"]
+    model["mixing"][:] = 0.0
+    model["network"]["weights"][:] = 0.0
+    states[:, :, compartment_names.index("E")] = 100.0
+    e = compartment_names.index("E")
+
+    _, history = ode_engine.runODESimulation(model, states, [0, 1, 2, 5], rtol=1e-10, atol=1e-8)
+
+    discrete = [states]
+    for _ in range(5):
+        discrete.append(engine.doProgression(model, discrete[-1]))
+    numpy.testing.assert_allclose(history[:, ..., e], numpy.array(discrete)[[0, 1, 2, 5]][..., e], rtol=1e-7)
+
+
+def test_runODESimulation_epidemic(population_model, compartment_names):
+    model, states = population_model["model"], population_model["states"]
+    states = numpy.repeat(states[numpy.newaxis], 2, axis=0)
+    states[:, 0, 1, compartment_names.index("E")] = 100.0
+    states[1, 0, 1, compartment_names.index("E")] = 0.0
+    times = numpy.arange(0, 200, 10)
+    stats = {}
+
+    infectious, history = ode_engine.runODESimulation(model, states, times, stats=stats)
+
+    assert infectious.shape == (len(times), 2)
+    numpy.testing.assert_allclose(history.sum(axis=(2, 3, 4)), [states.sum(axis=(1, 2, 3))] * len(times), rtol=1e-9)
+    assert (history > -1e-3).all()
+    assert infectious[:, 0].max() > 1000
+    assert (infectious[:, 1] == 0).all()
+    assert stats["steps"] < 1000
@@ -0,0 +1,312 @@
+import copy
+import random
+
+import networkx as nx
+import numpy
+import pytest
+
+from simple_network_sim import network_of_populations as np, population_engine as engine
+
+
+def test_statesToArray_roundtrip(population_model, compartment_names):
+    model, states = population_model["model"], population_model["dictOfStates"]
+
+    array = engine.statesToArray(model, states[0])
+
+    assert array.shape == (len(model["nodes"]), 3, len(compartment_names))
+    assert engine.arrayToStates(model, array) == states[0]
+
+
+def test_doTimestep_matches_dict_phases(population_model, age_infection_matrix):
+    model, states = population_model["model"], population_model["dictOfStates"]
+    for node in list(states[0])[:3]:
+        states[0][node][("m", "I")] = 50.0
+        states[0][node][("o", "E")] = 20.0
+
+    next_states = engine.doTimestep(model, engine.statesToArray(model, states[0]))
+
+    np.doInternalProgressionAllNodes(states, 0, population_model["ageToTrans"])
+    np.doInteralInfectionProcessAllNodes(states, age_infection_matrix, model["ages"], 0)
+    np.doBetweenInfectionAgeStructured(population_model["graph"], states, 0, 0.1)
+    numpy.testing.assert_allclose(next_states, engine.statesToArray(model, states[1]))
+
+
+def test_doTimestep_keeps_population_constant():
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", weight=5.0)
+    graph.add_edge("b", "a", weight=5.0)
+    graph.add_edge("a", "a", weight=100.0)
+    nodeStates = {
+        node: {(age, state): 0.0 for state in ["S", "E", "A", "I", "H", "R", "D"] for age in ["y", "o"]}
+        for node in graph.nodes()
+    }
+    nodeStates["a"][("y", "S")] = 10.0
+    nodeStates["a"][("y", "I")] = 1000.0
+    nodeStates["b"][("o", "S")] = 10.0
+    probs = {age: np.setUpParametersVanilla({param: 0.5 for param in [
+        "e_escape", "a_escape", "a_to_i", "i_escape", "i_to_d", "i_to_h", "h_escape", "h_to_d"
+    ]}) for age in ["y", "o"]}
+    model = engine.compileModel(graph, {"y": {"y": 1.0, "o": 1.0}, "o": {"y": 1.0, "o": 1.0}}, probs, nodeStates)
+    states = engine.statesToArray(model, nodeStates)
+
+    next_states = engine.doTimestep(model, states)
+
+    assert next_states.sum() == pytest.approx(states.sum())
+    assert (next_states >= 0).all()
+
+
+def test_basicSimulationInternalAgeStructure_seeds_dictOfStates(population_model, age_infection_matrix):
+    states = population_model["dictOfStates"]
+
+    result = engine.basicSimulationInternalAgeStructure(
+        rand=random.Random(1),
+        graph=population_model["graph"],
+        numInfected=10,
+        timeHorizon=5,
+        genericInfection=0.1,
+        ageInfectionMatrix=age_infection_matrix,
+        diseaseProgressionProbs=population_model["ageToTrans"],
+        dictOfStates=states,
+    )
+
+    assert len(result) == 5
+    assert sum(state[("m", "E")] for state in states[0].values()) == 10
+
+
+def test_basicSimulationEnsemble_matches_independent_runs(population_model, age_infection_matrix):
+    nodeStates = population_model["dictOfStates"][0]
+    kwargs = dict(
+        graph=population_model["graph"],
+        numInfected=10,
+        timeHorizon=30,
+        genericInfection=0.1,
+        ageInfectionMatrix=age_infection_matrix,
+        diseaseProgressionProbs=population_model["ageToTrans"],
+    )
+
+    ensemble = engine.basicSimulationEnsemble(
+        rands=[random.Random(seed) for seed in range(5)],
+        nodeStates=copy.deepcopy(nodeStates),
+        **kwargs,
+    )
+
+    runs = [
+        engine.basicSimulationInternalAgeStructure(
+            rand=random.Random(seed),
+            dictOfStates={0: copy.deepcopy(nodeStates)},
+            **kwargs,
+        )
+        for seed in range(5)
+    ]
+    assert ensemble.shape == (5, 30)
+    numpy.testing.assert_allclose(ensemble, runs)
+
+
+def test_runSimulation_history_modes(population_model):
+    model, initial = population_model["model"], population_model["states"]
+    initial[0, 1, 1] = 100.0
+
+    series, full = engine.runSimulation(model, initial, 10)
+    bounded_series, none = engine.runSimulation(model, initial, 10, keepHistory=False)
+    _, selected = engine.runSimulation(model, initial, 10, keepHistory=[0, 5, 10])
+
+    assert full.shape == (11,) + initial.shape
+    assert none is None
+    numpy.testing.assert_array_equal(series, bounded_series)
+    numpy.testing.assert_array_equal(selected, full[[0, 5, 10]])
+    assert initial[0, 1, 1] == 100.0
+
+
+@pytest.mark.parametrize("keepHistory", [[2, 50, 2], [5, 5], [5, 2], [-1], [0, 11]])
+def test_runSimulation_rejects_bad_history_times(population_model, keepHistory):
+    model, initial = population_model["model"], population_model["states"]
+
+    with pytest.raises(ValueError):
+        engine.runSimulation(model, initial, 10, keepHistory=keepHistory)
+    with pytest.raises(ValueError):
+        engine.runSimulation(model, initial, 10, keepHistory=[4, 6], startTime=5)
+
+
+def test_runSimulation_observers(population_model):
+    model, initial = population_model["model"], population_model["states"]
+    initial[0, 1, 1] = 100.0
+    observed = {}
+
+    _, history = engine.runSimulation(
+        model, initial, 10, keepHistory=False, observers=[lambda time, states: observed.setdefault(time, states.copy())]
+    )
+
+    _, full = engine.runSimulation(model, initial, 10)
+    assert sorted(observed) == list(range(11))
+    numpy.testing.assert_array_equal(numpy.array([observed[t] for t in range(11)]), full)
+
+
+def test_counters_follow_states(population_model):
+    model, initial = population_model["model"], population_model["states"]
+    initial[0, 1, 1] = 100.0
+    counters = engine.setUpCounters(model, initial)
+    observed = []
+
+    _, history = engine.runSimulation(
+        model,
+        initial,
+        30,
+        counters=counters,
+        observers=[lambda time, states: observed.append(engine.getNodeCounter(counters, "infectious").copy())],
+    )
+
+    compartments = model["compartments"]
+    for name, members in [("infectious", ["A", "I"]), ("susceptible", ["S"]), ("hospitalised", ["H"]), ("deaths", ["D"])]:
+        indices = [compartments.index(state) for state in members]
+        assert engine.getCounter(counters, name) == pytest.approx(history[-1][..., indices].sum())
+    assert engine.getCounter(counters, "population") == pytest.approx(initial.sum())
+    numpy.testing.assert_allclose(observed, history[..., [compartments.index("A"), compartments.index("I")]].sum(axis=(2, 3)))
+
+
+def test_sampleProgression_moves_whole_people(population_model):
+    model = population_model["model"]
+    initial = numpy.repeat(population_model["states"][numpy.newaxis], 200, axis=0)
+    initial[..., 1:6] = 1000.0
+
+    sampled = engine.sampleProgression(model, initial, numpy.random.default_rng(3))
+
+    numpy.testing.assert_array_equal(sampled, numpy.rint(sampled))
+    numpy.testing.assert_array_equal(sampled.sum(axis=-1), initial.sum(axis=-1))
+    expected = engine.doProgression(model, initial[0])
+    numpy.testing.assert_allclose(sampled.mean(axis=0)[..., 1:], expected[..., 1:], rtol=0.05, atol=5.0)
+
+
+def test_stochastic_runSimulation(population_model):
+    model = population_model["model"]
+    initial = numpy.repeat(population_model["states"][numpy.newaxis], 50, axis=0)
+    initial[:, 0, 1, 1] = 1.0
+    counters = engine.setUpCounters(model, initial)
+
+    series, history = engine.runSimulation(model, initial, 40, counters=counters, generator=numpy.random.default_rng(7))
+    again, _ = engine.runSimulation(model, initial, 40, generator=numpy.random.default_rng(7))
+
+    numpy.testing.assert_array_equal(series, again)
+    numpy.testing.assert_array_equal(history.sum(axis=(2, 3, 4)), numpy.repeat([initial.sum(axis=(1, 2, 3))], 41, axis=0))
+    assert (history >= 0).all()
+    numpy.testing.assert_array_equal(engine.getCounter(counters, "deaths"), history[-1][..., 6].sum(axis=(-2, -1)))
+    # starting from a single exposed person, some trials die out without infecting anybody and others do not
+    infections = (initial[..., 0] - history[-1][..., 0]).sum(axis=(1, 2))
+    assert (infections == 0).any() and (infections > 100).any()
+
+
+def test_runSimulation_stopThreshold(population_model):
+    model, initial = population_model["model"], population_model["states"]
+    initial[0, 1, 1] = 100.0
+    model["mixing"] *= 0.01
+    observed = []
+
+    series, history = engine.runSimulation(
+        model, initial, 200, stopThreshold=1.0, observers=[lambda time, states: observed.append(time)]
+    )
+    fullSeries, fullHistory = engine.runSimulation(model, initial, 200)
+
+    active = fullHistory[..., 1:5].sum(axis=(1, 2, 3))
+    stop = numpy.argmax(active <= 1.0)
+    assert 0 < stop < 200
+    numpy.testing.assert_array_equal(series[:stop + 1], fullSeries[:stop + 1])
+    assert (series[stop:] == series[stop]).all()
+    assert (history[stop:] == history[stop]).all()
+    assert observed == list(range(201))
+
+
+def test_stochastic_ensemble_stopThreshold_is_exact(population_model):
+    model = population_model["model"]
+    initial = numpy.repeat(population_model["states"][numpy.newaxis], 20, axis=0)
+    initial[:, 0, 1, 1] = 1.0
+    counters = engine.setUpCounters(model, initial)
+
+    series, history = engine.runSimulation(
+        model, initial, 40, counters=counters, generator=numpy.random.default_rng(7), stopThreshold=0
+    )
+    fullSeries, fullHistory = engine.runSimulation(model, initial, 40, generator=numpy.random.default_rng(7))
+
+    # extinct trials make no random draws, so freezing them changes nothing
+    numpy.testing.assert_array_equal(series, fullSeries)
+    numpy.testing.assert_array_equal(history, fullHistory)
+    numpy.testing.assert_array_equal(engine.getCounter(counters, "active"), fullHistory[-1][..., 1:5].sum(axis=(1, 2, 3)))
+
+
+def test_findActiveNodes():
+    graph = nx.DiGraph()
+    graph.add_edge("a", "b", weight=1.0)
+    graph.add_edge("b", "c", weight=1.0)
+    graph.add_edge("d", "a", weight=1.0)
+    nodeStates = {
+        node: {(age, state): 0.0 for state in ["S", "E", "A", "I", "H", "R", "D"] for age in ["y", "o"]}
+        for node in graph.nodes()
+    }
+    for node in nodeStates:
+        nodeStates[node][("y", "S")] = 10.0
+    probs = {age: np.setUpParametersVanilla({param: 0.5 for param in [
+        "e_escape", "a_escape", "a_to_i", "i_escape", "i_to_d", "i_to_h", "h_escape", "h_to_d"
+    ]}) for age in ["y", "o"]}
+    model = engine.compileModel(graph, {"y": {"y": 1.0, "o": 1.0}, "o": {"y": 1.0, "o": 1.0}}, probs, nodeStates)
+    states = engine.statesToArray(model, nodeStates)
+
+    assert engine.findActiveNodes(model, states).tolist() == []
+    states[model["nodes"].index("a"), 0, model["compartments"].index("I")] = 1.0
+    states[model["nodes"].index("d"), 0, model["compartments"].index("R")] = 1.0
+    assert [model["nodes"][n] for n in engine.findActiveNodes(model, states)] == ["a", "b"]
+    assert engine.findActiveNodes(model, states, limit=1) is None
+
+
+@pytest.mark.parametrize("seed", [None, 3])
+def test_runSimulation_activeFraction_matches_dense(population_model, seed):
+    model = population_model["model"]
+    initial = numpy.repeat(population_model["states"][numpy.newaxis], 4, axis=0)
+    initial[:, 2, 1, 1] = 3.0
+    # a network this small is connected in a step, so make the outbreak spread slowly enough to stay local for a bit
+    model["network"]["weights"] *= 1e-4
+    model["outgoing"]["weights"] *= 1e-4
+    generator = lambda: None if seed is None else numpy.random.default_rng(seed)
+    activeCounts = []
+    counters = engine.setUpCounters(model, initial)
+
+    def observe(time, states):
+        activeCounts.append(len(engine.findActiveNodes(model, states)))
+
+    series, history = engine.runSimulation(
+        model, initial, 30, generator=generator(), activeFraction=0.9, counters=counters, observers=[observe]
+    )
+    denseSeries, denseHistory = engine.runSimulation(model, initial, 30, generator=generator())
+
+    assert min(activeCounts) < len(model["nodes"]) * 0.9
+    numpy.testing.assert_allclose(history, denseHistory, rtol=1e-12, atol=1e-9)
+    numpy.testing.assert_allclose(series, denseSeries, rtol=1e-12)
+    numpy.testing.assert_allclose(engine.getCounter(counters, "population"), initial.sum(axis=(1, 2, 3)))
+    if seed is not None:
+        numpy.testing.assert_array_equal(history, denseHistory)
+
+
+def test_runSimulation_activeFraction_with_infectious_that_stay():
+    graph = nx.DiGraph()
+    for n in range(10):
+        graph.add_edge(str(n), str((n + 1) % 10), weight=1.0)
+        graph.add_edge(str(n), str(n), weight=100.0)
+    nodeStates = {
+        node: {(age, state): 0.0 for state in ["S", "E", "A", "I", "H", "R", "D"] for age in ["y", "o"]}
+        for node in graph.nodes()
+    }
+    for node in nodeStates:
+        nodeStates[node][("y", "S")] = 100.0
+    nodeStates["0"][("y", "A")] = 10.0
+    params = {param: 0.5 for param in ["e_escape", "a_to_i", "i_escape", "i_to_d", "i_to_h", "h_escape", "h_to_d"]}
+    # nobody ever leaves A, so a node with only A (and S) in it moves nobody on but still infects itself
+    probs = {age: np.setUpParametersVanilla(dict(params, a_escape=0.0)) for age in ["y", "o"]}
+    model = engine.compileModel(graph, {"y": {"y": 0.1, "o": 0.1}, "o": {"y": 0.1, "o": 0.1}}, probs, nodeStates)
+    model["network"]["weights"] *= 1e-3
+    model["outgoing"]["weights"] *= 1e-3
+    states = engine.statesToArray(model, nodeStates)
+
+    assert model["nodes"].index("0") in engine.findActiveNodes(model, states)
+
+    series, history = engine.runSimulation(model, states, 5, activeFraction=0.5)
+    denseSeries, denseHistory = engine.runSimulation(model, states, 5)
+
+    numpy.testing.assert_allclose(history, denseHistory, rtol=1e-12, atol=1e-12)
+    numpy.testing.assert_allclose(series, denseSeries, rtol=1e-12)
@@ -0,0 +1,65 @@
+import copy
+import random
+
+from simple_network_sim import network_of_populations as np, profiling
+
+
+def _count_self_loops(graph):
+    return sum(1 for u, v in graph.edges() if u == v)
+
+
+def test_profile_phases():
+    profile = profiling.newProfile(trace=True)
+
+    for time in range(3):
+        start = profiling.startPhase(profile)
+        profiling.addCounts(profile, nodesVisited=2)
+        profiling.addCounts(profile, nodesVisited=1, edgesEvaluated=4)
+        profiling.endPhase(profile, "phase", start, time)
+
+    assert profile["phases"]["phase"]["calls"] == 3
+    assert profile["phases"]["phase"]["counts"] == {"nodesVisited": 9, "edgesEvaluated": 12}
+    assert [entry["time"] for entry in profile["trace"]] == [0, 1, 2]
+    assert profile["trace"][0]["counts"] == {"nodesVisited": 3, "edgesEvaluated": 4}
+    assert "phase" in profiling.formatSummary(profile)
+
+
+def test_disabled_profile_is_a_no_op():
+    start = profiling.startPhase(None)
+    profiling.addCounts(None, nodesVisited=1)
+    profiling.endPhase(None, "phase", start, 0)
+
+
+def test_basicSimulationInternalAgeStructure_profile(population_model, age_infection_matrix):
+    graph = population_model["graph"]
+    states = population_model["dictOfStates"]
+    kwargs = dict(
+        graph=graph,
+        numInfected=10,
+        timeHorizon=5,
+        genericInfection=0.1,
+        ageInfectionMatrix=age_infection_matrix,
+        diseaseProgressionProbs=population_model["ageToTrans"],
+    )
+    profile = profiling.newProfile(trace=True)
+
+    profiled = np.basicSimulationInternalAgeStructure(
+        rand=random.Random(1),
+        dictOfStates=copy.deepcopy(states),
+        profile=profile,
+        **kwargs,
+    )
+    plain = np.basicSimulationInternalAgeStructure(
+        rand=random.Random(1),
+        dictOfStates=states,
+        **kwargs,
+    )
+
+    assert profiled == plain
+    phases = profile["phases"]
+    for phase in ["progression", "internalInfection", "betweenInfection"]:
+        assert phases[phase]["calls"] == 5
+        assert phases[phase]["counts"]["nodesVisited"] == 5 * graph.number_of_nodes()
+    assert phases["betweenInfection"]["counts"]["edgesEvaluated"] == 5 * (graph.number_of_edges() - _count_self_loops(graph))
+    assert phases["progression"]["counts"]["dictAllocations"] == 5 * graph.number_of_nodes()
+    assert len(profile["trace"]) == 1 + 5 * 6
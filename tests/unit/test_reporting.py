@@ -0,0 +1,58 @@
+import io
+
+import numpy
+import pytest
+
+from simple_network_sim import network_of_populations as np, population_engine as engine, reporting
+
+
+@pytest.fixture
+def model_and_history(population_model):
+    model, initial = population_model["model"], population_model["states"]
+    initial[0, 1, 1] = 100.0
+    _, history = engine.runSimulation(model, initial, 5)
+    yield model, history
+
+
+def test_aggregations(model_and_history):
+    model, history = model_and_history
+
+    assert reporting.aggregateOverAges(history).shape == (6, len(model["nodes"]), 7)
+    assert reporting.aggregateOverNodes(history).shape == (6, 3, 7)
+    assert reporting.aggregateOverNodes(history).sum() == pytest.approx(history.sum())
+
+
+def test_aggregateByAttribute(model_and_history):
+    model, history = model_and_history
+    attributes = {node: {"region": "north" if i < 4 else "south"} for i, node in enumerate(model["nodes"])}
+
+    groups, grouped = reporting.aggregateByAttribute(history, model["nodes"], attributes, "region")
+
+    assert groups == ["north", "south"]
+    numpy.testing.assert_allclose(grouped[:, 0], history[:, :4].sum(axis=1))
+    numpy.testing.assert_allclose(grouped[:, 1], history[:, 4:].sum(axis=1))
+
+
+def test_aggregateByAttribute_missing(model_and_history):
+    model, history = model_and_history
+
+    with pytest.raises(ValueError):
+        reporting.aggregateByAttribute(history, model["nodes"], {}, "region")
+
+
+def test_writeBasicReport_matches_basicReportingFunction(model_and_history):
+    model, history = model_and_history
+    dictOfStates = {time: engine.arrayToStates(model, history[time]) for time in range(history.shape[0])}
+    fp = io.StringIO()
+
+    reporting.writeBasicReport(fp, model, reporting.historyFromDictOfStates(model, dictOfStates))
+
+    lines = fp.getvalue().splitlines()
+    assert lines[0] == "node,state,0,1,2,3,4,5"
+    expected = np.basicReportingFunction(dictOfStates).splitlines()[1:]
+    assert len(lines[1:]) == len(expected)
+    for line, expectedLine in zip(lines[1:], expected):
+        label, state, *values = line.split(",")
+        expectedLabel, expectedState, *expectedValues = expectedLine.split(",")
+        assert (label, state) == (expectedLabel, expectedState)
+        assert [float(v) for v in values] == pytest.approx([float(v) for v in expectedValues])
@@ -0,0 +1,68 @@
+import os
+
+import numpy
+import pytest
+
+from simple_network_sim import population_engine as engine, result_store
+
+
+def _run(population_model, directory, leading=1):
+    model = population_model["model"]
+    initial = numpy.repeat(population_model["states"][numpy.newaxis], leading, axis=0)
+    initial[:, 0, 1, 1] = numpy.arange(1, leading + 1) * 10.0
+
+    store = result_store.createStore(directory, model, 7, leadingShape=(leading,), chunkSize=3)
+    _, history = engine.runSimulation(model, initial, 7, observers=[result_store.observer(store)])
+    result_store.closeStore(store)
+    return model, history
+
+
+def test_store_roundtrip(population_model, tmpdir):
+    model, history = _run(population_model, str(tmpdir), leading=2)
+
+    store = result_store.openStore(str(tmpdir))
+
+    assert sorted(os.listdir(str(tmpdir))) == ["chunk-000000.dat", "chunk-000001.dat", "chunk-000002.dat", "metadata.json"]
+    assert store["metadata"]["nodes"] == model["nodes"]
+    numpy.testing.assert_array_equal(result_store.readStates(store), history)
+
+
+def test_store_slices(population_model, tmpdir):
+    model, history = _run(population_model, str(tmpdir))
+    store = result_store.openStore(str(tmpdir))
+    nodes = [model["nodes"][3], model["nodes"][1]]
+
+    sliced = result_store.readStates(store, times=(2, 7), nodes=nodes, ages=["m"], compartments=["E", "I"])
+
+    expected = history[2:7][:, :, [3, 1]][:, :, :, [model["ages"].index("m")]][..., [1, 3]]
+    numpy.testing.assert_array_equal(sliced, expected)
+    assert result_store.readStates(store, times=(4, 4)).shape == (0, 1, len(model["nodes"]), 3, 7)
+
+
+def test_store_rejects_bad_selections(population_model, tmpdir):
+    _run(population_model, str(tmpdir))
+    store = result_store.openStore(str(tmpdir))
+
+    with pytest.raises(ValueError):
+        result_store.readStates(store, compartments=["X"])
+    with pytest.raises(ValueError):
+        result_store.readStates(store, times=(0, 9))
+    with pytest.raises(ValueError):
+        result_store.writeStates(store, 8, numpy.zeros(1))
+
+
+def test_createStore_replaces_existing_store(population_model, tmpdir):
+    _run(population_model, str(tmpdir), leading=2)
+    with open(os.path.join(str(tmpdir), "notes.txt"), "w") as f:
+        f.write("kept")
+    model = population_model["model"]
+    states = population_model["states"]
+
+    store = result_store.createStore(str(tmpdir), model, 4, chunkSize=3)
+    result_store.writeStates(store, 0, states)
+    result_store.closeStore(store)
+
+    assert sorted(os.listdir(str(tmpdir))) == ["chunk-000000.dat", "metadata.json", "notes.txt"]
+    stored = result_store.readStates(result_store.openStore(str(tmpdir)), times=(0, 3))
+    numpy.testing.assert_array_equal(stored[0], states)
+    assert (stored[1:] == 0).all()
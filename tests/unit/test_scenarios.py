@@ -0,0 +1,82 @@
+import numpy
+import pytest
+
+from simple_network_sim import population_engine as engine, scenarios
+
+
+@pytest.mark.parametrize("stochastic", [False, True])
+def test_branch_without_changes_matches_single_run(population_model, exposed_states, stochastic):
+    model = population_model["model"]
+    initialStates = exposed_states(10, trials=3)
+
+    def generator():
+        return numpy.random.default_rng(5) if stochastic else None
+
+    expected, expectedHistory = engine.runSimulation(model, initialStates, 50, generator=generator())
+    prefix = scenarios.runPrefix(model, initialStates, 20, generator=generator())
+    first = scenarios.branch(prefix, 50)
+    second = scenarios.branch(prefix, 50)
+
+    for scenario in [first, second]:
+        numpy.testing.assert_array_equal(scenarios.getTimeSeries(scenario), expected)
+        numpy.testing.assert_array_equal(scenarios.getHistory(scenario), expectedHistory)
+        numpy.testing.assert_array_equal(scenario["states"], expectedHistory[50])
+
+
+def test_branches_share_prefix_history(population_model, exposed_states):
+    model = population_model["model"]
+    initialStates = exposed_states(10, trials=3)
+    prefix = scenarios.runPrefix(model, initialStates, 20)
+
+    lockdown = scenarios.branch(prefix, 60, changes={"mixing": model["mixing"] * 0.1})
+    later = scenarios.branch(scenarios.branch(prefix, 35), 60, changes={"mixing": model["mixing"] * 0.1})
+    carryOn = scenarios.branch(prefix, 60)
+
+    assert lockdown["history"].shape[0] == 40
+    assert numpy.shares_memory(scenarios.getStates(lockdown, 10), scenarios.getStates(carryOn, 10))
+    assert numpy.shares_memory(scenarios.getStates(later, 20), prefix["history"])
+    assert not prefix["history"].flags.writeable
+    with pytest.raises(ValueError):
+        prefix["history"][0, 0, 0, 0, 0] = 1.0
+
+    numpy.testing.assert_array_equal(scenarios.getStates(later, 30), scenarios.getStates(carryOn, 30))
+    peaks = [scenarios.getTimeSeries(scenario).max(axis=0) for scenario in [lockdown, later, carryOn]]
+    assert (peaks[0] < peaks[1]).all() and (peaks[1] <= peaks[2]).all()
+    for scenario in [lockdown, later, carryOn]:
+        assert scenarios.getTimeSeries(scenario).shape == (60, 3)
+        assert scenarios.getHistory(scenario).shape[0] == 61
+
+
+def test_branch_with_another_network(population_model, exposed_states):
+    model = population_model["model"]
+    initialStates = exposed_states(10, trials=3)
+    prefix = scenarios.runPrefix(model, initialStates, 10, keepHistory=False)
+    closed = dict(model["network"], weights=numpy.zeros_like(model["network"]["weights"]))
+
+    isolated = scenarios.branch(prefix, 30, changes={"network": closed})
+    without = dict(model, network=closed)
+    expected, _ = engine.runSimulation(
+        without, prefix["states"], 30, keepHistory=False, startTime=10,
+        counters=dict(engine.setUpCounters(without, prefix["states"]), nodes=prefix["counterNodes"].copy(), total=prefix["counterTotal"].copy()),
+    )
+
+    assert isolated["model"]["outgoing"]["weights"].sum() == 0
+    numpy.testing.assert_array_equal(isolated["timeSeriesInfection"], expected)
+    with pytest.raises(ValueError):
+        scenarios.getHistory(isolated)
+    with pytest.raises(ValueError):
+        scenarios.getStates(isolated, 5)
+    assert scenarios.getStates(isolated, 10) is prefix["states"]
+
+
+def test_branch_rejects_bad_changes(population_model, exposed_states):
+    model = population_model["model"]
+    initialStates = exposed_states(10, trials=3)
+    prefix = scenarios.runPrefix(model, initialStates, 5)
+
+    with pytest.raises(ValueError):
+        scenarios.branch(prefix, 10, changes={"ages": ["y"]})
+    with pytest.raises(ValueError):
+        scenarios.branch(prefix, 10, changes={"network": dict(model["network"], nodes=model["nodes"][::-1])})
+    with pytest.raises(ValueError):
+        scenarios.branch(prefix, 3)
@@ -0,0 +1,127 @@
+import copy
+import os
+import random
+
+import numpy
+import pytest
+
+from simple_network_sim import loaders, population_engine as engine, schedules
+
+
+@pytest.fixture
+def comix():
+    yield os.path.join(
+        os.path.dirname(__file__), "..", "..", "sample_input_files", "sample_20200327_comix_social_contacts.sampleCSV"
+    )
+
+
+def test_aggregateMixingMatrix():
+    matrix = {"a": {"a": 1.0, "b": 2.0, "c": 3.0}, "b": {"a": 4.0, "b": 5.0, "c": 6.0}, "c": {"a": 7.0, "b": 8.0, "c": 9.0}}
+    bandToAge = {"a": {"y": 1.0}, "b": {"y": 0.5, "o": 0.5}, "c": {"o": 1.0}}
+
+    aggregated = schedules.aggregateMixingMatrix(matrix, bandToAge, bandWeights={"a": 1.0, "b": 2.0, "c": 1.0})
+
+    # young: all of a (weight 1) and half of b (weight 2), so a and b count the same
+    assert aggregated["y"]["y"] == pytest.approx(((1.0 + 0.5 * 2.0) + (4.0 + 0.5 * 5.0)) / 2)
+    assert aggregated["y"]["o"] == pytest.approx(((0.5 * 2.0 + 3.0) + (0.5 * 5.0 + 6.0)) / 2)
+    assert aggregated["o"]["y"] == pytest.approx(((4.0 + 0.5 * 5.0) + (7.0 + 0.5 * 8.0)) / 2)
+    with pytest.raises(ValueError):
+        schedules.aggregateMixingMatrix(matrix, {"a": {"y": 1.0}})
+
+
+def test_readCOMIXMatrix(comix):
+    bands = loaders.readMixingMatrix(comix)
+
+    matrix = schedules.readCOMIXMatrix(comix, 0.5)
+
+    assert sorted(matrix) == ["m", "o", "y"]
+    assert all(sorted(row) == ["m", "o", "y"] for row in matrix.values())
+    assert matrix["o"]["o"] == pytest.approx(0.5 * bands["70+"]["70+"])
+    assert matrix["o"]["m"] == pytest.approx(0.5 * (sum(bands["70+"][band] for band in list(bands)[2:7]) + bands["70+"]["[5,18)"] / 13))
+
+
+def test_compileSchedule(population_model, comix):
+    model = population_model["model"]
+    network = model["network"]
+    source, target = network["nodes"][network["indices"][0]], network["nodes"][0]
+    lockdown = schedules.readCOMIXMatrix(comix, 0.1)
+
+    schedule = schedules.compileSchedule(model, [
+        {"start": 30, "mixing": lockdown, "edgeScaling": 0.2},
+        {"start": 10, "end": 20, "edgeScaling": {(source, target): 0.5}, "nodeMultipliers": {target: 0.0}},
+    ], 50)
+
+    assert schedule["index"].tolist() == [0] * 10 + [1] * 10 + [0] * 10 + [2] * 20
+    assert schedule["models"][0] is model
+    assert numpy.shares_memory(schedule["models"][2]["mixing"], schedule["mixing"])
+    assert numpy.shares_memory(schedule["models"][1]["network"]["weights"], schedule["weights"])
+    assert schedule["models"][2]["mixing"][model["ages"].index("o"), model["ages"].index("y")] == lockdown["o"]["y"]
+    numpy.testing.assert_array_equal(schedule["mixing"][1], model["mixing"])
+    numpy.testing.assert_allclose(schedule["weights"][2], network["weights"] * 0.2)
+    assert schedule["weights"][1, 0] == network["weights"][0] * 0.5
+    numpy.testing.assert_array_equal(schedule["weights"][1, 1:], network["weights"][1:])
+    assert schedule["nodeMultipliers"][1].tolist() == [0.0] + [1.0] * (len(model["nodes"]) - 1)
+
+
+@pytest.mark.parametrize("schedule", [
+    [{"start": 5, "end": 15}, {"start": 10}],
+    [{"start": 5, "end": 5}],
+    [{"start": 50}],
+    [{"start": 60, "end": 70}],
+    [{"start": 5, "contacts": 0.1}],
+    [{"start": 5, "nodeMultipliers": {"nowhere": 0.0}}],
+    [{"start": 5, "edgeScaling": {("nowhere", "S08000015"): 0.0}}],
+])
+def test_compileSchedule_rejects_bad_periods(population_model, schedule):
+    model = population_model["model"]
+
+    with pytest.raises(ValueError):
+        schedules.compileSchedule(model, schedule, 50)
+
+
+def test_runSimulation_with_schedule(population_model, exposed_states, comix):
+    model = population_model["model"]
+    states = exposed_states(20)
+    lockdown = schedules.readCOMIXMatrix(comix, 0.1)
+    schedule = schedules.compileSchedule(model, [{"start": 20, "end": 40, "mixing": lockdown, "edgeScaling": 0.1}], 60)
+
+    timeSeries, history = engine.runSimulation(model, states, 60, schedule=schedule)
+
+    before, beforeHistory = engine.runSimulation(model, states, 20)
+    during, duringHistory = engine.runSimulation(schedule["models"][1], beforeHistory[20], 40, startTime=20)
+    after, afterHistory = engine.runSimulation(model, duringHistory[-1], 60, startTime=40)
+    numpy.testing.assert_allclose(timeSeries, numpy.concatenate([before, during, after]), rtol=1e-12)
+    numpy.testing.assert_array_equal(history[60], afterHistory[-1])
+    with pytest.raises(ValueError):
+        engine.runSimulation(model, states, 61, schedule=schedule)
+
+
+@pytest.mark.parametrize("stochastic", [False, True])
+def test_nodeMultipliers_stop_infections(population_model, exposed_states, compartment_names, stochastic):
+    model = population_model["model"]
+    states = exposed_states(20)
+    schedule = schedules.compileSchedule(model, [{"start": 5, "nodeMultipliers": {node: 0.0 for node in model["nodes"]}}], 30)
+    generator = numpy.random.default_rng(1) if stochastic else None
+
+    _, history = engine.runSimulation(model, numpy.rint(states), 30, generator=generator, schedule=schedule)
+
+    susceptible = history[..., compartment_names.index("S")].sum(axis=(1, 2))
+    assert susceptible[5] < susceptible[0]
+    assert (susceptible[5:] == susceptible[5]).all()
+
+
+def test_basicSimulationInternalAgeStructure_with_schedule(population_model, age_infection_matrix):
+    graph, age_to_trans = population_model["graph"], population_model["ageToTrans"]
+    states = population_model["dictOfStates"]
+    closed = {age: {other: 0.0 for other in age_infection_matrix} for age in age_infection_matrix}
+
+    open_ = engine.basicSimulationInternalAgeStructure(
+        random.Random(1), graph, 10, 60, 0.1, age_infection_matrix, age_to_trans, copy.deepcopy(states)
+    )
+    locked = engine.basicSimulationInternalAgeStructure(
+        random.Random(1), graph, 10, 60, 0.1, age_infection_matrix, age_to_trans, copy.deepcopy(states),
+        schedule=[{"start": 10, "mixing": closed, "edgeScaling": 0.0}],
+    )
+
+    assert locked[:11] == open_[:11]
+    assert max(locked) < max(open_)
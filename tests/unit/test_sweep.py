@@ -0,0 +1,102 @@
+import copy
+import random
+
+import numpy
+import pytest
+
+from simple_network_sim import network_of_populations as np, population_engine as engine, sweep
+
+
+def _mixing(ages, contactRate):
+    return {a: {b: contactRate for b in ages} for a in ages}
+
+
+def test_gridPoints():
+    points = sweep.gridPoints(contactRate=[0.1, 0.2], e_escape=[0.3, 0.4, 0.5])
+
+    assert len(points) == 6
+    assert points[0] == {"contactRate": 0.1, "e_escape": 0.3}
+    assert points[-1] == {"contactRate": 0.2, "e_escape": 0.5}
+
+
+def test_sweepModel_stacks_parameters(population_model, compartment_names):
+    model, ageParams = population_model["model"], population_model["ageParams"]
+    points = [{}, {"contactRate": 0.5}, {"o,i_to_h": 0.3}, {"e_escape": 0.9}]
+
+    swept = sweep.sweepModel(model, ageParams, points, extraAxes=1)
+
+    assert swept["transitions"].shape == (4, 1) + model["transitions"].shape
+    assert swept["mixing"].shape == (4, 1) + model["mixing"].shape
+    assert swept["network"] is model["network"]
+    numpy.testing.assert_array_equal(swept["transitions"][0, 0], model["transitions"])
+    assert (swept["mixing"][1] == 0.5).all()
+    o = model["ages"].index("o")
+    i, h = compartment_names.index("I"), compartment_names.index("H")
+    assert swept["transitions"][2, 0, o, i, h] == pytest.approx(0.3 * ageParams["o"]["i_escape"])
+    numpy.testing.assert_array_equal(
+        numpy.delete(swept["transitions"][2, 0], o, axis=0), numpy.delete(model["transitions"], o, axis=0)
+    )
+    e = compartment_names.index("E")
+    numpy.testing.assert_allclose(swept["transitions"][3, 0, :, e, e], 0.1)
+
+
+def test_sweepModel_unknown_parameter(population_model):
+    model, ageParams = population_model["model"], population_model["ageParams"]
+
+    with pytest.raises(ValueError):
+        sweep.sweepModel(model, ageParams, [{"e_scape": 0.1}])
+    with pytest.raises(ValueError):
+        sweep.sweepModel(model, ageParams, [{"x,e_escape": 0.1}])
+
+
+def test_runSweep_matches_separate_runs(population_model, age_infection_matrix):
+    ageParams, graph = population_model["ageParams"], population_model["graph"]
+    nodeStates = population_model["dictOfStates"][0]
+    points = sweep.gridPoints(contactRate=[0.1, 0.3], **{"m,i_to_h": [0.1, 0.2]})
+
+    result = sweep.runSweep(random.Random(3), graph, 10, 50, age_infection_matrix, ageParams, nodeStates, points)
+
+    assert result["dims"] == ["point", "time", "counter"]
+    assert result["values"].shape == (4, 51, len(engine.COUNTERS))
+    assert result["coords"]["counter"] == list(engine.COUNTERS)
+    numpy.testing.assert_array_equal(result["parameters"]["contactRate"], [0.1, 0.1, 0.3, 0.3])
+    numpy.testing.assert_array_equal(result["parameters"]["m,i_to_h"], [0.1, 0.2, 0.1, 0.2])
+    infectious = result["coords"]["counter"].index("infectious")
+    for p, point in enumerate(points):
+        pointParams = copy.deepcopy(ageParams)
+        pointParams["m"]["i_to_h"] = point["m,i_to_h"]
+        dictOfStates = {0: copy.deepcopy(nodeStates)}
+        expected = engine.basicSimulationInternalAgeStructure(
+            random.Random(3), graph, 10, 50, 0.1, _mixing(ageParams.keys(), point["contactRate"]),
+            np.setUpParametersAges(pointParams), dictOfStates,
+        )
+        numpy.testing.assert_allclose(result["values"][p, :50, infectious], expected)
+
+
+def test_runSweep_early_stop_keeps_each_points_parameters(population_model, age_infection_matrix):
+    ageParams, graph = population_model["ageParams"], population_model["graph"]
+    nodeStates = population_model["dictOfStates"][0]
+    points = [{"contactRate": 0.0}, {"contactRate": 0.3}]
+
+    stopped = sweep.runSweep(random.Random(1), graph, 10, 40, age_infection_matrix, ageParams, nodeStates, points, stopThreshold=0.5)
+    full = sweep.runSweep(random.Random(1), graph, 10, 40, age_infection_matrix, ageParams, nodeStates, points)
+
+    numpy.testing.assert_allclose(stopped["values"][1], full["values"][1])
+    active = stopped["coords"]["counter"].index("active")
+    assert stopped["values"][0, -1, active] <= 0.5
+
+
+def test_runSweep_stochastic(population_model, age_infection_matrix):
+    ageParams, graph = population_model["ageParams"], population_model["graph"]
+    nodeStates = population_model["dictOfStates"][0]
+    points = sweep.gridPoints(contactRate=[0.0, 0.2])
+
+    result = sweep.runSweep(
+        random.Random(1), graph, 10, 30, age_infection_matrix, ageParams, nodeStates, points,
+        generator=numpy.random.default_rng(2),
+    )
+
+    susceptible = result["coords"]["counter"].index("susceptible")
+    population = result["coords"]["counter"].index("population")
+    numpy.testing.assert_allclose(result["values"][:, :, population], result["values"][:, :1, population].repeat(31, axis=1))
+    assert result["values"][1, 0, susceptible] > result["values"][1, -1, susceptible]